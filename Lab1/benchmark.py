@@ -0,0 +1,297 @@
+"""
+Benchmarks for the search functions of search.py.
+
+Every searcher is run under a Budget on seeded corpora of problems: 8-puzzles
+grouped by the length of their shortest solution, N-Queens boards of several
+sizes and random road maps. For each run the time, the nodes expanded and the
+peak memory are recorded, and the results can be saved as CSV or JSON and
+compared against a baseline saved earlier, so that a change to search.py can
+be judged by numbers:
+    python benchmark.py --out baseline.json
+    ... change search.py ...
+    python benchmark.py --baseline baseline.json
+
+The corpora depend only on their seeds, and the node counts of a search do
+not depend on the machine, so any change in them comes from the code.
+"""
+
+import argparse
+import copy
+import csv
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+from utils import print_table
+from search import (EightPuzzle, GraphProblem, NQueensProblem, RandomGraph, SearchStats, Budget, path_costs,
+                    breadth_first_tree_search, depth_first_tree_search, breadth_first_graph_search,
+                    depth_first_graph_search, uniform_cost_search, depth_limited_search,
+                    iterative_deepening_search, bidirectional_search, astar_search, ida_star_search,
+                    recursive_best_first_search, arena_breadth_first_graph_search, arena_astar_search)
+
+SEARCHERS = {searcher.__name__: searcher for searcher in (
+    breadth_first_tree_search, depth_first_tree_search, breadth_first_graph_search,
+    depth_first_graph_search, uniform_cost_search, depth_limited_search,
+    iterative_deepening_search, bidirectional_search, astar_search, ida_star_search,
+    recursive_best_first_search, arena_breadth_first_graph_search, arena_astar_search)}
+
+FIELDS = ('corpus', 'case', 'searcher', 'reason', 'cost', 'length', 'seconds',
+          'expanded', 'generated', 'max_frontier', 'peak_kb')
+NUMERIC = ('cost', 'length', 'seconds', 'expanded', 'generated', 'max_frontier', 'peak_kb')
+
+
+# ______________________________________________________________________________
+# Corpora: lists of (name, problem)
+
+
+def eight_puzzles(depths=(4, 8, 12, 16, 20, 24), per_depth=2, seed=0):
+    """Return per_depth 8-puzzles whose shortest solution takes exactly d moves
+    for each d in depths, found by a breadth-first search back from the goal."""
+    goal = (1, 2, 3, 4, 5, 6, 7, 8, 0)
+    puzzle = EightPuzzle(goal)
+    by_depth = {0: [goal]}
+    depth = {goal: 0}
+    frontier = deque([goal])
+    while frontier:
+        state = frontier.popleft()
+        if depth[state] == max(depths):
+            continue
+        for action in puzzle.actions(state):
+            child = puzzle.result(state, action)
+            if child not in depth:
+                depth[child] = depth[state] + 1
+                by_depth.setdefault(depth[child], []).append(child)
+                frontier.append(child)
+    rng = random.Random(seed)
+    cases = []
+    for d in depths:
+        states = by_depth.get(d, [])
+        for i, state in enumerate(rng.sample(states, min(per_depth, len(states)))):
+            cases.append(('depth{}-{}'.format(d, i), EightPuzzle(state)))
+    return cases
+
+
+def queens(sizes=(4, 6, 8, 10, 12)):
+    """Return an N-Queens problem for each N in sizes"""
+    return [('n{}'.format(n), NQueensProblem(n)) for n in sizes]
+
+
+def random_graphs(sizes=(100, 1000, 10000), per_size=2, seed=0):
+    """Return per_size routes between random cities on a RandomGraph of each
+    size, whose cities are spread over a square with about 100 units per city.
+    A random graph need not be connected, so each goal is drawn from the cities
+    reachable from its initial city. The global random generator is restored
+    afterwards."""
+    state = random.getstate()
+    try:
+        random.seed(seed)
+        cases = []
+        for n in sizes:
+            side = int((n * 100) ** 0.5)
+            graph = RandomGraph(list(range(n)), min_links=2, width=side, height=side)
+            for i in range(per_size):
+                initial = random.randrange(n)
+                reachable = list(path_costs(GraphProblem(initial, None, graph)))
+                goal = random.choice(reachable[1:] or reachable)
+                cases.append(('n{}-{}'.format(n, i), GraphProblem(initial, goal, graph)))
+        return cases
+    finally:
+        random.setstate(state)
+
+
+def corpora(quick=False):
+    """Return {corpus name: list of (name, problem)}, with small problems only if quick"""
+    if quick:
+        return {'8-puzzle': eight_puzzles((2, 4, 6), per_depth=2),
+                'n-queens': queens((4, 5, 6)),
+                'random-graph': random_graphs((50,), per_size=2)}
+    return {'8-puzzle': eight_puzzles(), 'n-queens': queens(), 'random-graph': random_graphs()}
+
+
+# ______________________________________________________________________________
+# Running
+
+
+def run_one(searcher, problem, budget):
+    """Run searcher on a copy of problem and return (result, stats); the copy
+    keeps tables a problem builds lazily from being shared between searchers"""
+    stats = SearchStats()
+    # Start each run without garbage left over from the previous one
+    gc.collect()
+    try:
+        result = searcher(copy.copy(problem), stats=stats, budget=budget)
+    except NotImplementedError:
+        # bidirectional_search needs Problem.reverse
+        stats.reason = 'unsupported'
+        result = None
+    return result, stats
+
+
+def run_benchmarks(cases=None, searchers=None, budget=None, memory=True, repeat=1):
+    """Run every searcher on every problem and return one dict per run with
+    the FIELDS. cases is {corpus: list of (name, problem)} and defaults to
+    corpora(), smallest problems first; searchers is {name: search function}
+    and defaults to SEARCHERS; budget defaults to 1 second and 100000
+    expansions per run. reason is the stats.reason of the search, or
+    'unsupported'; cost and length are those of the solution, or None; seconds
+    is the best of repeat runs.
+    With memory=True each search is run once more under tracemalloc, which
+    slows it down too much to be timed, for peak_kb: the most memory allocated
+    at once, in kilobytes. That run has no time limit but stops after as many
+    expansions as the timed one, so that it does the same work."""
+    cases = corpora() if cases is None else cases
+    searchers = SEARCHERS if searchers is None else searchers
+    budget = budget or Budget(max_seconds=1, max_expansions=100000)
+    rows = []
+    for corpus, problems in cases.items():
+        # A first run on the smallest problem, not recorded, so that one-time
+        # costs such as the import of numpy are not charged to any run
+        for searcher in searchers.values():
+            if problems:
+                run_one(searcher, problems[0][1], budget)
+        for case, problem in problems:
+            for name, searcher in searchers.items():
+                result, stats = run_one(searcher, problem, budget)
+                seconds = stats.elapsed
+                for _ in range(repeat - 1):
+                    seconds = min(seconds, run_one(searcher, problem, budget)[1].elapsed)
+                solved = stats.reason == 'goal'
+                row = dict(corpus=corpus, case=case, searcher=name, reason=stats.reason,
+                           cost=result.path_cost if solved else None,
+                           length=result.depth if solved else None,
+                           seconds=round(seconds, 6), expanded=stats.nodes_expanded,
+                           generated=stats.nodes_generated, max_frontier=stats.max_frontier, peak_kb=None)
+                if memory and stats.reason != 'unsupported':
+                    expansions = stats.nodes_expanded if stats.reason == 'time' else budget.max_expansions
+                    tracemalloc.start()
+                    try:
+                        run_one(searcher, problem, Budget(max_expansions=expansions, max_states=budget.max_states))
+                        row['peak_kb'] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+                    finally:
+                        tracemalloc.stop()
+                rows.append(row)
+    return rows
+
+
+# ______________________________________________________________________________
+# Saving and comparing results
+
+
+def write_results(rows, filename):
+    """Write rows to filename, as JSON if it ends in .json and as CSV otherwise"""
+    with open(filename, 'w', newline='') as file:
+        if filename.endswith('.json'):
+            json.dump(rows, file, indent=1)
+        else:
+            writer = csv.DictWriter(file, FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def read_results(filename):
+    """Read rows written by write_results, with numbers as numbers and empty
+    CSV fields as None"""
+    with open(filename, 'r', newline='') as file:
+        if filename.endswith('.json'):
+            return json.load(file)
+        rows = list(csv.DictReader(file))
+    for row in rows:
+        for field in NUMERIC:
+            value = row.get(field)
+            row[field] = None if value in (None, '') else float(value)
+    return rows
+
+
+def compare(baseline, rows, time_tolerance=0.25, memory_tolerance=0.1, min_seconds=0.01):
+    """Return the regressions of rows against baseline, rows of an earlier run,
+    as a list of (corpus, case, searcher, what, baseline value, new value).
+    A run regresses when it no longer solves its problem, finds a costlier
+    solution, expands more nodes, takes time_tolerance (a fraction) longer and
+    at least min_seconds more, or peaks memory_tolerance higher. Node counts and
+    memory are only compared when neither run was stopped by the clock. Runs
+    with no counterpart in baseline are not compared."""
+    before = {(row['corpus'], row['case'], row['searcher']): row for row in baseline}
+    regressions = []
+    for row in rows:
+        key = (row['corpus'], row['case'], row['searcher'])
+        old = before.get(key)
+        if old is None:
+            continue
+        if old['reason'] == 'goal' and row['reason'] != 'goal':
+            regressions.append(key + ('reason', old['reason'], row['reason']))
+            continue
+        if row['reason'] == 'goal' and old['cost'] is not None and row['cost'] > old['cost']:
+            regressions.append(key + ('cost', old['cost'], row['cost']))
+        # Node counts and memory only depend on the code, unless the clock stopped the search
+        deterministic = row['reason'] == old['reason'] != 'time'
+        if deterministic and row['expanded'] > old['expanded']:
+            regressions.append(key + ('expanded', old['expanded'], row['expanded']))
+        if row['seconds'] > max(old['seconds'] * (1 + time_tolerance), old['seconds'] + min_seconds):
+            regressions.append(key + ('seconds', old['seconds'], row['seconds']))
+        if deterministic and row['peak_kb'] is not None and old['peak_kb'] is not None and \
+                row['peak_kb'] > old['peak_kb'] * (1 + memory_tolerance):
+            regressions.append(key + ('peak_kb', old['peak_kb'], row['peak_kb']))
+    return regressions
+
+
+def summarize(rows):
+    """Print, for each corpus and searcher, how many problems were solved and
+    the total time and expansions and the highest memory peak"""
+    totals = {}
+    for row in rows:
+        total = totals.setdefault((row['corpus'], row['searcher']), [0, 0, 0.0, 0, 0.0])
+        total[0] += row['reason'] == 'goal'
+        total[1] += 1
+        total[2] += row['seconds']
+        total[3] += row['expanded']
+        total[4] = max(total[4], row['peak_kb'] or 0)
+    table = [[corpus, searcher, '{}/{}'.format(solved, runs), seconds, int(expanded), peak]
+             for (corpus, searcher), (solved, runs, seconds, expanded, peak) in totals.items()]
+    print_table(table, ['Corpus', 'Searcher', 'Solved', 'Seconds', 'Expanded', 'Peak kB'], numfmt='{:.3f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the search functions of search.py.')
+    parser.add_argument('--quick', action='store_true', help='run small problems only')
+    parser.add_argument('--searchers', help='comma separated names of the searchers to run (default: all)')
+    parser.add_argument('--seconds', type=float, help='time budget of each run (default: 1, 0.2 if --quick)')
+    parser.add_argument('--expansions', type=int,
+                        help='expansion budget of each run (default: 100000, 10000 if --quick)')
+    parser.add_argument('--repeat', type=int, default=1, help='time each run this many times and keep the best')
+    parser.add_argument('--no-memory', action='store_true', help='skip the tracemalloc runs')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='fraction by which a run may be slower than the baseline')
+    parser.add_argument('--out', help='write the results to this .csv or .json file')
+    parser.add_argument('--baseline', help='compare the results with this .csv or .json file')
+    args = parser.parse_args(argv)
+
+    searchers = SEARCHERS
+    if args.searchers:
+        unknown = set(args.searchers.split(',')) - set(SEARCHERS)
+        if unknown:
+            parser.error('unknown searchers: ' + ', '.join(sorted(unknown)))
+        searchers = {name: SEARCHERS[name] for name in args.searchers.split(',')}
+    start = time.perf_counter()
+    rows = run_benchmarks(corpora(args.quick), searchers,
+                          Budget(max_seconds=args.seconds or (0.2 if args.quick else 1),
+                                 max_expansions=args.expansions or (10000 if args.quick else 100000)),
+                          memory=not args.no_memory, repeat=args.repeat)
+    summarize(rows)
+    print('{} runs in {:.1f}s'.format(len(rows), time.perf_counter() - start))
+    if args.out:
+        write_results(rows, args.out)
+    if args.baseline:
+        regressions = compare(read_results(args.baseline), rows, time_tolerance=args.tolerance)
+        for regression in regressions:
+            print('REGRESSION {} {} {}: {} {} -> {}'.format(*regression))
+        print('{} regressions against {}'.format(len(regressions), args.baseline))
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
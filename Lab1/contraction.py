@@ -0,0 +1,283 @@
+"""
+Contraction hierarchies for fast shortest-path queries on static road maps.
+
+Preprocessing removes the nodes of the graph one at a time, least important
+first. When node v is removed, every path u -> v -> x that is the only
+cheapest way from u to x is kept as a shortcut link u -> x. A query then runs
+Dijkstra's algorithm from both ends but only along links to nodes removed
+later ("upward"), which settles a few hundred nodes even on large maps. The
+shortcuts on the path found are unpacked into the original links.
+
+The hierarchy is built once, saved to a file and memory-mapped when loaded:
+    hierarchy = build_contraction_hierarchy(romania_map)
+    save_contraction_hierarchy('romania.ch', hierarchy)
+    hierarchy = load_contraction_hierarchy('romania.ch')
+    contraction_hierarchy_search(GraphProblem('Arad', 'Bucharest', romania_map), hierarchy)
+"""
+
+import heapq
+import math
+import mmap
+import struct
+import sys
+from array import array
+
+from graph_io import decode_names, encode_names
+from search import CompiledGraphProblem, Graph, Node, SearchStats
+
+MAGIC = b'CH02'
+# magic, byte order, padding, number of nodes, of upward links, of downward links, length of the names
+HEADER = struct.Struct('<4sB3xqqqq')
+NO_MIDDLE = -1
+
+
+class ContractionHierarchy:
+    """The links kept by contraction, as two sets of CSR arrays by node id.
+    up[v] holds the links v -> x to nodes x contracted after v, for the search
+    from the start; down[v] holds the links u -> v from nodes u contracted
+    after v, for the search from the goal. Each set is a tuple (offsets,
+    targets, weights, middles); middles[e] is the node a shortcut bypasses,
+    or NO_MIDDLE for a link of the original graph."""
+
+    def __init__(self, nodes, up, down):
+        self.nodes = nodes
+        self.index = {node: i for i, node in enumerate(nodes)}
+        self.up = up
+        self.down = down
+
+    def middle(self, links, v, target):
+        """Return the middle of the link between v and target in links"""
+        offsets, targets, _, middles = links
+        for e in range(offsets[v], offsets[v + 1]):
+            if targets[e] == target:
+                return middles[e]
+        raise KeyError((v, target))
+
+    def unpack(self, a, b, middle, path):
+        """Append to path the original nodes after a on the link a -> b"""
+        stack = [(a, b, middle)]
+        while stack:
+            a, b, middle = stack.pop()
+            if middle == NO_MIDDLE:
+                path.append(b)
+                continue
+            # middle was contracted before a and b, so a -> middle is one of its
+            # downward links and middle -> b one of its upward links
+            stack.append((middle, b, self.middle(self.up, middle, b)))
+            stack.append((a, middle, self.middle(self.down, middle, a)))
+
+    def query(self, s, t, stats=None):
+        """Return (cost, path) of the cheapest path from node id s to node id t,
+        where path lists the node ids from s to t, or (inf, None)."""
+        stats = stats or SearchStats()
+        if s == t:
+            return 0, [s]
+        costs = ({s: 0}, {t: 0})
+        parents = ({s: None}, {t: None})
+        frontiers = ([(0, s)], [(0, t)])
+        best, meeting = math.inf, None
+        while frontiers[0] or frontiers[1]:
+            tops = [frontier[0][0] if frontier else math.inf for frontier in frontiers]
+            if min(tops) >= best:
+                break
+            side = 0 if tops[0] <= tops[1] else 1
+            cost, v = heapq.heappop(frontiers[side])
+            if cost > costs[side][v]:
+                continue
+            stats.nodes_expanded += 1
+            offsets, targets, weights, middles = self.up if side == 0 else self.down
+            mine, other = costs[side], costs[1 - side]
+            for e in range(offsets[v], offsets[v + 1]):
+                stats.nodes_generated += 1
+                x, c = targets[e], cost + weights[e]
+                if c < mine.get(x, math.inf):
+                    mine[x] = c
+                    parents[side][x] = (v, middles[e])
+                    heapq.heappush(frontiers[side], (c, x))
+                    if x in other and c + other[x] < best:
+                        best, meeting = c + other[x], x
+            if v in other and cost + other[v] < best:
+                best, meeting = cost + other[v], v
+        if meeting is None:
+            return math.inf, None
+
+        # The upward half from s to the meeting node, in order
+        links = []
+        v = meeting
+        while parents[0][v] is not None:
+            u, middle = parents[0][v]
+            links.append((u, v, middle))
+            v = u
+        links.reverse()
+        # The downward half: the search from t reached u through the link u -> v
+        u = meeting
+        while parents[1][u] is not None:
+            v, middle = parents[1][u]
+            links.append((u, v, middle))
+            u = v
+        path = [s]
+        for a, b, middle in links:
+            self.unpack(a, b, middle, path)
+        return best, path
+
+
+def build_contraction_hierarchy(graph, settle_limit=64):
+    """Contract every node of graph, a Graph or CompiledGraph with numeric
+    link lengths, and return the ContractionHierarchy. Nodes are ordered by
+    twice the edge difference (shortcuts added minus links removed) plus the
+    number of neighbors already contracted, updated lazily. A shortcut is skipped when a
+    witness search, which settles at most settle_limit nodes, finds another
+    path that is no longer; a smaller limit is faster but adds more shortcuts."""
+    if isinstance(graph, Graph):
+        graph = graph.freeze()
+    n = len(graph)
+    # out[u][x] = (length, middle) and into[x][u] = length for the links among
+    # nodes not yet contracted
+    out = [{} for _ in range(n)]
+    into = [{} for _ in range(n)]
+    for a in range(n):
+        for e in graph.edges(a):
+            b, w = graph.targets[e], graph.weights[e]
+            if a != b and w < out[a].get(b, (math.inf,))[0]:
+                out[a][b] = (w, NO_MIDDLE)
+                into[b][a] = w
+    up = [None] * n
+    down = [None] * n
+    contracted_neighbors = [0] * n
+
+    def witness_costs(u, v, limit):
+        """Costs from u of the nodes settled by a Dijkstra search that avoids v
+        and stops beyond limit or after settle_limit nodes"""
+        costs = {u: 0}
+        frontier = [(0, u)]
+        settled = 0
+        while frontier and settled < settle_limit:
+            cost, a = heapq.heappop(frontier)
+            if cost > costs[a]:
+                continue
+            if cost > limit:
+                break
+            settled += 1
+            for b, (w, _) in out[a].items():
+                c = cost + w
+                if b != v and c < costs.get(b, math.inf):
+                    costs[b] = c
+                    heapq.heappush(frontier, (c, b))
+        return costs
+
+    def shortcuts(v):
+        """Return the shortcuts (u, x, length) that contracting v needs"""
+        needed = []
+        for u, w1 in into[v].items():
+            candidates = {x: w1 + w2 for x, (w2, _) in out[v].items() if x != u}
+            if not candidates:
+                continue
+            costs = witness_costs(u, v, max(candidates.values()))
+            needed.extend((u, x, w) for x, w in candidates.items() if costs.get(x, math.inf) > w)
+        return needed
+
+    def priority(v, needed):
+        return 2 * (len(needed) - len(into[v]) - len(out[v])) + contracted_neighbors[v]
+
+    queue = [(priority(v, shortcuts(v)), v) for v in range(n)]
+    heapq.heapify(queue)
+    while queue:
+        _, v = heapq.heappop(queue)
+        # Lazy update: contract v only if it is still the least important node
+        needed = shortcuts(v)
+        current = priority(v, needed)
+        if queue and current > queue[0][0]:
+            heapq.heappush(queue, (current, v))
+            continue
+        for u, x, w in needed:
+            if w < out[u].get(x, (math.inf,))[0]:
+                out[u][x] = (w, v)
+                into[x][u] = w
+        # Every remaining neighbor is contracted after v
+        up[v] = [(x, w, middle) for x, (w, middle) in out[v].items()]
+        down[v] = [(u, w, out[u][v][1]) for u, w in into[v].items()]
+        for x in out[v]:
+            del into[x][v]
+            contracted_neighbors[x] += 1
+        for u in into[v]:
+            del out[u][v]
+            contracted_neighbors[u] += 1
+        out[v], into[v] = {}, {}
+    return ContractionHierarchy(graph.nodes, _links(up), _links(down))
+
+
+def _links(adjacency):
+    """Pack a list of [(target, length, middle)] by node into CSR arrays"""
+    offsets, targets, weights, middles = array('q', [0]), array('q'), array('d'), array('q')
+    for links in adjacency:
+        for target, w, middle in links:
+            targets.append(target)
+            weights.append(w)
+            middles.append(middle)
+        offsets.append(len(targets))
+    return offsets, targets, weights, middles
+
+
+def contraction_hierarchy_search(problem, hierarchy, stats=None):
+    """Find the cheapest path for problem, a GraphProblem or CompiledGraphProblem
+    on the graph the hierarchy was built from, with a ContractionHierarchy query.
+    Returns the goal Node of the path, built with problem.path_cost, or None."""
+    stats = (stats or SearchStats()).start()
+    compiled = isinstance(problem, CompiledGraphProblem)
+    if compiled:
+        s, t = problem.initial, problem.goal
+    else:
+        s, t = hierarchy.index[problem.initial], hierarchy.index[problem.goal]
+    cost, path = hierarchy.query(s, t, stats)
+    if path is None:
+        return stats.finish('exhausted', None)
+    node = Node(problem.initial)
+    for b in path[1:]:
+        if compiled:
+            graph = problem.graph
+            # The cheapest of the links from node.state to b
+            action = min((e for e in graph.edges(node.state) if graph.targets[e] == b),
+                         key=graph.weights.__getitem__)
+        else:
+            action = hierarchy.nodes[b]
+        node = node.child_node(problem, action)
+    return stats.finish('goal', node)
+
+
+def save_contraction_hierarchy(filename, hierarchy):
+    """Write hierarchy to filename: a header, the upward and downward link
+    arrays, then the node names as given by graph_io.encode_names, so that
+    they are read back with their types. The arrays are in native byte order.
+    Raises TypeError if a node name is not a str, int or float."""
+    names = encode_names(hierarchy.nodes)
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, sys.byteorder == 'little', len(hierarchy.nodes),
+                               len(hierarchy.up[1]), len(hierarchy.down[1]), len(names)))
+        for links in (hierarchy.up, hierarchy.down):
+            for column, typecode in zip(links, 'qqdq'):
+                file.write(array(typecode, column).tobytes())
+        file.write(names)
+
+
+def load_contraction_hierarchy(filename):
+    """Memory-map a file written by save_contraction_hierarchy and return its
+    ContractionHierarchy, whose arrays are read-only views of the file."""
+    with open(filename, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, little_endian, n, n_up, n_down, names_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(filename + ' is not a contraction hierarchy file')
+    if little_endian != (sys.byteorder == 'little'):
+        raise ValueError(filename + ' was written on a machine with the other byte order')
+    view = memoryview(data)
+    offset = HEADER.size
+
+    def column(typecode, length):
+        nonlocal offset
+        result = view[offset:offset + 8 * length].cast(typecode)
+        offset += 8 * length
+        return result
+
+    up = tuple(column(typecode, length) for typecode, length in zip('qqdq', (n + 1, n_up, n_up, n_up)))
+    down = tuple(column(typecode, length) for typecode, length in zip('qqdq', (n + 1, n_down, n_down, n_down)))
+    return ContractionHierarchy(decode_names(view[offset:offset + names_length]), up, down)
@@ -0,0 +1,144 @@
+"""
+Loading large graphs without building a dict per node.
+
+Edge lists are read line by line straight into the arrays of a CompiledGraph,
+and a CompiledGraph can be saved in a binary file that is memory-mapped when it
+is loaded again, so opening a road network only reads its node names:
+    graph = read_edge_list('roads.csv', locations='junctions.csv', delimiter=',', header=True)
+    save_compiled_graph('roads.csr', graph)
+    graph = load_compiled_graph('roads.csr')
+    astar_search(CompiledGraphProblem('A', 'B', graph))
+"""
+
+import json
+import math
+import mmap
+import struct
+import sys
+from array import array
+
+from search import CompiledGraph
+
+MAGIC = b'CSR2'
+# magic, byte order, has locations, padding, number of nodes, number of links, length of the names
+HEADER = struct.Struct('<4sBB2xqqq')
+
+
+def _rows(file, delimiter):
+    """Yield the fields of each line of file, skipping blank lines and # comments"""
+    for line in file:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            yield [field.strip() for field in line.split(delimiter)]
+
+
+def encode_names(nodes):
+    """Encode node names as a JSON list in UTF-8, which keeps strings, ints
+    and floats apart and allows any character in a name. Raises TypeError for
+    a name of any other type, which could not be read back as it was."""
+    for node in nodes:
+        if not isinstance(node, (str, int, float)):
+            raise TypeError('cannot save node {!r}: names must be str, int or float'.format(node))
+    return json.dumps(list(nodes), ensure_ascii=False).encode('utf-8')
+
+
+def decode_names(data):
+    """Return the list of node names encoded by encode_names"""
+    return json.loads(bytes(data).decode('utf-8'))
+
+
+def read_edge_list(edges, locations=None, directed=True, delimiter=None, header=False):
+    """Read a CompiledGraph from an edge list with one link per line,
+    'source target [length]', the length defaulting to 1. edges is a file
+    name or an iterable of lines. Fields are separated by whitespace, or by
+    delimiter (',' for CSV, '\\t' for TSV). With header=True the first line of
+    each file is a header and is skipped. locations optionally gives lines
+    'node x y' for the straight-line heuristic. Node names are kept as strings.
+    With directed=False every link is also added the other way round."""
+    if isinstance(edges, str):
+        with open(edges, 'r') as file:
+            return read_edge_list(file, locations, directed, delimiter, header)
+    index = {}
+    sources, targets, weights = array('q'), array('q'), array('d')
+    for number, row in enumerate(_rows(edges, delimiter)):
+        if number == 0 and header:
+            continue
+        a = index.setdefault(row[0], len(index))
+        b = index.setdefault(row[1], len(index))
+        dist = float(row[2]) if len(row) > 2 else 1.0
+        sources.append(a)
+        targets.append(b)
+        weights.append(dist)
+        if not directed:
+            sources.append(b)
+            targets.append(a)
+            weights.append(dist)
+    x = y = None
+    if locations is not None:
+        x, y = read_locations(locations, index, delimiter, header)
+    return CompiledGraph.from_edges(list(index), sources, targets, weights, x, y, index)
+
+
+def read_locations(locations, index, delimiter=None, header=False):
+    """Read lines 'node x y' from a file name or an iterable of lines and
+    return arrays x and y by node id; nodes without a line get NaN.
+    With header=True the first line is skipped."""
+    if isinstance(locations, str):
+        with open(locations, 'r') as file:
+            return read_locations(file, index, delimiter, header)
+    x = array('d', [math.nan]) * len(index)
+    y = array('d', [math.nan]) * len(index)
+    for number, row in enumerate(_rows(locations, delimiter)):
+        if number == 0 and header:
+            continue
+        i = index.get(row[0])
+        if i is not None:
+            x[i], y[i] = float(row[1]), float(row[2])
+    return x, y
+
+
+def save_compiled_graph(filename, graph):
+    """Write graph to filename: a header, the offsets, targets and weights,
+    the locations if any, then the node names as given by encode_names.
+    The arrays are in native byte order, so they can be mapped as they are.
+    Raises TypeError if a node name is not a str, int or float."""
+    names = encode_names(graph.nodes)
+    has_locations = graph.x is not None
+    with open(filename, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, sys.byteorder == 'little', has_locations,
+                               len(graph.nodes), len(graph.targets), len(names)))
+        for column, typecode in ((graph.offsets, 'q'), (graph.targets, 'q'), (graph.weights, 'd')):
+            file.write(array(typecode, column).tobytes())
+        if has_locations:
+            file.write(array('d', graph.x).tobytes())
+            file.write(array('d', graph.y).tobytes())
+        file.write(names)
+
+
+def load_compiled_graph(filename):
+    """Memory-map a file written by save_compiled_graph and return its
+    CompiledGraph, whose arrays are read-only views of the file. Node names
+    are read back with the types they were saved with."""
+    with open(filename, 'rb') as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, little_endian, has_locations, n, m, names_length = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(filename + ' is not a compiled graph file')
+    if little_endian != (sys.byteorder == 'little'):
+        raise ValueError(filename + ' was written on a machine with the other byte order')
+    view = memoryview(data)
+    offset = HEADER.size
+
+    def column(typecode, length):
+        nonlocal offset
+        size = 8 * length
+        result = view[offset:offset + size].cast(typecode)
+        offset += size
+        return result
+
+    offsets, targets, weights = column('q', n + 1), column('q', m), column('d', m)
+    x = y = None
+    if has_locations:
+        x, y = column('d', n), column('d', n)
+    nodes = decode_names(view[offset:offset + names_length])
+    return CompiledGraph(nodes, offsets, targets, weights, x, y)
@@ -1,8 +1,10 @@
-import pandas as pd
+import os
 import sys
 from utils import *
 
-from search import astar_search, breadth_first_graph_search, iterative_deepening_search, EightPuzzle
+from pattern_db import PatternDatabase
+from search import astar_search, breadth_first_graph_search, iterative_deepening_search, ida_star_search, \
+    EightPuzzle, NPuzzle, PackedNPuzzle, ManhattanHeuristic, SearchStats, Budget, print_results
 
 state = [1, 2, 3, 4, 5, 6, 7, 8, 0]
 puzzle = EightPuzzle(tuple(state))
@@ -25,15 +27,40 @@ def solve_steps():
     print(solution)
 
 
+def parse_row(line):
+    """Convert a line of whitespace separated tiles to a list of integers,
+    reading '_' as the blank (0)"""
+    return [0 if token == '_' else int(token) for token in line.split()]
+
+
+def read_states(lines):
+    """Yield each board in lines, a file or any iterable of strings, as a flat
+    list of integers. A board is either laid out as a grid, with as many rows as
+    its first row has tiles, or ends at a blank line or at the end of the input,
+    so several boards can follow each other in one file. Raises ValueError for
+    a board whose number of tiles is not square."""
+    board, width = [], 0
+    # The empty line at the end closes the last board
+    for line in chain(lines, ['']):
+        row = parse_row(line)
+        if row:
+            width = width or len(row)
+            board.extend(row)
+            if len(board) != width * width:
+                continue
+        if board:
+            if int(round(len(board) ** 0.5)) ** 2 != len(board):
+                raise ValueError('the puzzle must be a square board, got {} tiles'.format(len(board)))
+            yield board
+        board, width = [], 0
+
+
 def read_state(filename):
-    """Import a file and convert it to an array of integers"""
-    file = pd.read_csv(filename, delim_whitespace=True, header=None)
-    flat_list = [item for sublist in file.values for item in sublist]
-    for idx, item in enumerate(flat_list):
-        if item == '_':
-            flat_list[idx] = 0
-        flat_list[idx] = int(flat_list[idx])
-    return flat_list
+    """Import a file and convert its first board to an array of integers"""
+    with open(filename, 'r') as file:
+        for board in read_states(file):
+            return board
+    raise ValueError(filename + ' does not hold a puzzle')
 
 
 def main():
@@ -41,14 +68,27 @@ def main():
     global solution
     global puzzle
 
+    if len(sys.argv) in (3, 4) and sys.argv[1] == 'batch':
+        import json
+        try:
+            for record in batch(batch_sources(sys.argv[2]), *sys.argv[3:]):
+                print(json.dumps(record), flush=True)
+        except ValueError as error:
+            print('Error:', error)
+        return
     if len(sys.argv) != 3:
-        print_solution("Must provide two parameters: file name and type of algorithm")
+        print("Must provide two parameters: file name and type of algorithm (or portfolio)")
+        print("or: batch DIRECTORY|GLOB|- [algorithm]")
         return
     filename = sys.argv[1]
     algorithm = sys.argv[2]
 
-    state = read_state(filename)
-    puzzle = EightPuzzle(tuple(state))
+    try:
+        state = read_state(filename)
+    except ValueError as error:
+        print('Error:', error)
+        return
+    puzzle = make_puzzle(state)
 
     if not puzzle.check_solvability(state):
         print('The inputted puzzle is not solvable:')
@@ -56,44 +96,253 @@ def main():
             print(file.read())
         return
 
-    """Cases of each input algorithm with their printed solution"""
+    if algorithm == 'portfolio':
+        winner = portfolio(state)
+        if winner is None:
+            print('No algorithm in the portfolio found a solution')
+            return
+        algorithm, solution, stats = winner
+        print('Winning strategy:', algorithm)
+        print_results(stats)
+        print_solution(solution)
+        return
+
+    stats = SearchStats()
+    try:
+        result = run_algorithm(algorithm, puzzle, stats, Budget(max_seconds=15 * 60))
+    except ValueError as error:
+        print('Error:', error)
+        return
+
+    print_results(stats)
+    if result:
+        solution = result.solution()
+        print_solution(solution)
+
+
+def make_puzzle(state):
+    """Return the puzzle for a flat board of any square size"""
+    n = int(round(len(state) ** 0.5))
+    return EightPuzzle(tuple(state)) if n == 3 else NPuzzle(n, tuple(state))
+
+
+def run_algorithm(algorithm, puzzle, stats=None, budget=None):
+    """Cases of each input algorithm, returning the result of its search.
+    Raises ValueError for an algorithm that is unknown or cannot solve puzzle."""
+    # Boards up to 4x4 fit in an int, which is cheaper to hash and store for uninformed search
+    packed = PackedNPuzzle(puzzle.n, puzzle.initial) if puzzle.n <= 4 else puzzle
     match algorithm:
         case 'BFS':
-            result = breadth_first_graph_search(puzzle)
-            if result:
-                solution = result.solution()
-                print_solution(solution)
+            return breadth_first_graph_search(packed, stats=stats, budget=budget)
         case 'IDS':
-            result = iterative_deepening_search(puzzle)
-            if result:
-                solution = result.solution()
-                print_solution(solution)
+            return iterative_deepening_search(packed, stats=stats, budget=budget)
+        case 'IDA':
+            h = ManhattanHeuristic(puzzle, linear_conflict=True)
+            return ida_star_search(puzzle, h, stats=stats, budget=budget)
         case 'h1':
             h = memoize(puzzle.h, 'h')
-            result = astar_search(puzzle, lambda n: misplaced(n) + h(n), display=True)
-            if result:
-                solution = result.solution()
-                print_solution(solution)
+            return astar_search(puzzle, lambda n: misplaced(n) + h(n), stats=stats, budget=budget)
         case 'h2':
             h = memoize(puzzle.h, 'h')
-            result = astar_search(puzzle, lambda n: n.path_cost + h(n), display=True)
-            if result:
-                solution = result.solution()
-                print_solution(solution)
+            return astar_search(puzzle, lambda n: n.path_cost + h(n), stats=stats, budget=budget)
         case 'h3':
             h = memoize(puzzle.h, 'h')
-            result = astar_search(puzzle, lambda n: custom_sums(n) + h(n), display=True)
-            if result:
-                solution = result.solution()
-                print_solution(solution)
+            return astar_search(puzzle, lambda n: custom_sums(n) + h(n), stats=stats, budget=budget)
+        case 'h4':
+            return astar_search(puzzle, ManhattanHeuristic(puzzle), stats=stats, budget=budget)
+        case 'h5':
+            h = ManhattanHeuristic(puzzle, linear_conflict=True)
+            return astar_search(puzzle, h, stats=stats, budget=budget)
+        case 'pdb':
+            if puzzle.n != 3:
+                raise ValueError('pattern databases are only built for the 3x3 puzzle')
+            return astar_search(puzzle, pattern_database().h, stats=stats, budget=budget)
         case _:
-            print('Error: unsupported algorithm ' + algorithm)
+            raise ValueError('unsupported algorithm ' + algorithm)
+
+
+_pattern_database = None
+
+
+def pattern_database():
+    """Return the 3x3 pattern database, loading it only once per process"""
+    global _pattern_database
+    if _pattern_database is None:
+        _pattern_database = PatternDatabase()
+    return _pattern_database
+
+
+# Algorithms tried by portfolio, fastest first, and the ones among them that always return a shortest path
+PORTFOLIO = ('pdb', 'h5', 'IDA', 'h4', 'h2', 'h3', 'h1', 'BFS', 'IDS')
+OPTIMAL = ('BFS', 'IDS', 'IDA', 'h4', 'h5', 'pdb')
+# Extra limits for the uninformed searches in a portfolio, which could otherwise fill
+# the memory (BFS) or hold a worker (IDS) long after an informed search has won
+PORTFOLIO_LIMITS = {'BFS': dict(max_states=1000000), 'IDS': dict(max_expansions=10000000)}
+
+_cancel = None
+
+
+def _start_worker(cancel):
+    """Keep the shared cancel event in each worker process. A multiprocessing
+    Event can only be handed to a process when it starts, not with each task."""
+    global _cancel
+    _cancel = cancel
+
+
+def _run_worker(algorithm, state, max_seconds):
+    """Solve state with one algorithm and return (algorithm, solution, stats),
+    where solution is None if the search failed, ran out of time or was cancelled"""
+    global puzzle
+    puzzle = make_puzzle(state)
+    stats = SearchStats()
+    budget = Budget(max_seconds=max_seconds, cancel=_cancel, **PORTFOLIO_LIMITS.get(algorithm, {}))
+    result = run_algorithm(algorithm, puzzle, stats, budget)
+    return algorithm, result.solution() if result else None, stats
+
+
+def portfolio(state, algorithms=PORTFOLIO, max_seconds=15 * 60, max_workers=None):
+    """Run the algorithms on state in parallel processes and return
+    (algorithm, solution, stats) for the first one to find an optimal solution,
+    or for the first solution of all if none of the optimal algorithms finds one.
+    The other searches are cancelled as soon as the winner is known.
+    The algorithms are started in PORTFOLIO order, so with fewer workers than
+    algorithms the informed searches run first.
+    Returns None if no algorithm found a solution."""
+    # Imported here so that solving a single puzzle does not pay for them
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    if len(state) != 9:
+        algorithms = [algorithm for algorithm in algorithms if algorithm != 'pdb']
+    rank = {algorithm: i for i, algorithm in enumerate(PORTFOLIO)}
+    algorithms = sorted(algorithms, key=lambda algorithm: rank.get(algorithm, len(rank)))
+    cancel = multiprocessing.Event()
+    executor = ProcessPoolExecutor(max_workers=max_workers or min(len(algorithms), os.cpu_count() or 1),
+                                   initializer=_start_worker, initargs=(cancel,))
+    winner = None
+    try:
+        futures = [executor.submit(_run_worker, algorithm, tuple(state), max_seconds) for algorithm in algorithms]
+        for future in as_completed(futures):
+            algorithm, solution, stats = future.result()
+            if solution is None:
+                continue
+            if algorithm in OPTIMAL:
+                winner = algorithm, solution, stats
+                break
+            if winner is None:
+                winner = algorithm, solution, stats
+    finally:
+        cancel.set()
+        executor.shutdown(wait=True, cancel_futures=True)
+    return winner
+
+
+def batch_sources(source):
+    """Yield (name, filename, state) for each puzzle named by source: a directory,
+    whose files are all read, a glob pattern, or '-' for one board per line on
+    standard input. Exactly one of filename and state is None. A line of standard
+    input is passed on unparsed, so that a bad line fails on its own in a worker."""
+    if source == '-':
+        for number, line in enumerate(sys.stdin, 1):
+            if line.strip():
+                yield '<stdin>:' + str(number), None, line
+    else:
+        import glob
+        if os.path.isdir(source):
+            filenames = [os.path.join(source, name) for name in sorted(os.listdir(source))]
+        else:
+            filenames = sorted(glob.glob(source))
+        for filename in filenames:
+            if os.path.isfile(filename):
+                yield filename, filename, None
+
+
+_batch_algorithm = None
+
+
+def _start_batch_worker(algorithm):
+    """Load the heuristic tables once when a batch worker starts, so that every
+    puzzle it solves reuses them"""
+    global _batch_algorithm
+    _batch_algorithm = algorithm
+    if algorithm == 'pdb':
+        pattern_database()
+
+
+def _solve_batch_item(item):
+    """Solve the puzzles of one item from batch_sources and return their JSON
+    records. A file holding several boards gives one record for each, and the
+    state may be a line of text still to be parsed."""
+    name, filename, state = item
+    try:
+        if isinstance(state, str):
+            state = tuple(parse_row(state))
+        if state is not None:
+            return [_solve_batch_state(name, state)]
+        with open(filename, 'r') as file:
+            boards = list(read_states(file))
+    except (OSError, ValueError) as error:
+        return [{'path': name, 'length': None, 'nodes': 0, 'time': 0.0, 'error': str(error)}]
+    if len(boards) == 1:
+        return [_solve_batch_state(name, boards[0])]
+    return [_solve_batch_state(name, board, number) for number, board in enumerate(boards, 1)]
+
+
+def _solve_batch_state(name, state, board=None):
+    """Solve state and return its JSON record"""
+    global puzzle
+    record = {'path': name, 'length': None, 'nodes': 0, 'time': 0.0}
+    if board is not None:
+        record['board'] = board
+    if int(round(len(state) ** 0.5)) ** 2 != len(state):
+        record['error'] = 'the puzzle must be a square board, got {} tiles'.format(len(state))
+        return record
+    puzzle = make_puzzle(state)
+    if not puzzle.check_solvability(puzzle.initial):
+        record['reason'] = 'unsolvable'
+        return record
+    stats = SearchStats()
+    try:
+        result = run_algorithm(_batch_algorithm, puzzle, stats, Budget(max_seconds=15 * 60))
+    except ValueError as error:
+        record['error'] = str(error)
+        return record
+    if result:
+        record['length'] = len(result.solution())
+    record.update(nodes=stats.nodes_generated, time=stats.elapsed, reason=stats.reason)
+    return record
+
+
+def batch(items, algorithm='h5', max_workers=None, window=None):
+    """Solve every (name, filename, state) item on a pool of worker processes and
+    yield a record for each puzzle, in order, with the path, solution length, nodes
+    generated and time taken. Each worker loads its tables once when it starts.
+    At most window items (four per worker by default) are read ahead of the
+    record being yielded, so a long stream of items is never held in memory and
+    records come out while later items are still being read."""
+    from collections import deque
+    from concurrent.futures import ProcessPoolExecutor
+    from itertools import islice
+    if algorithm not in PORTFOLIO:
+        raise ValueError('unsupported algorithm ' + algorithm)
+    if algorithm == 'pdb':
+        # Build the table file here, before the workers race to write it
+        pattern_database()
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_start_batch_worker,
+                             initargs=(algorithm,)) as executor:
+        items = iter(items)
+        window = window or 4 * (max_workers or os.cpu_count() or 1)
+        pending = deque(executor.submit(_solve_batch_item, item) for item in islice(items, window))
+        while pending:
+            # Results that finish early wait in the queue until those before them are out
+            yield from pending.popleft().result()
+            for item in islice(items, 1):
+                pending.append(executor.submit(_solve_batch_item, item))
 
 
 def misplaced(n):
     """count misplaced tiles"""
     result = 0
-    for i in range(1, 9):
+    for i in range(1, len(n.state)):
         if n.state[i - 1] != i:
             result += 1
 
@@ -103,14 +352,13 @@ def misplaced(n):
 def custom_sums(n):
     """check whether the sum of current states' rows or columns is the same or different from the sum of the
     goal states """
+    width = puzzle.n
     result = 0
-    result = result + abs(n.state[0] + n.state[1] + n.state[2] - 6)
-    result = result + abs(n.state[3] + n.state[4] + n.state[5] - 15)
-    result = result + abs(n.state[6] + n.state[7] + n.state[8] - 15)
+    for i in range(width):
+        result = result + abs(sum(n.state[i * width:(i + 1) * width]) - sum(puzzle.goal[i * width:(i + 1) * width]))
 
-    result = result + abs(n.state[0] + n.state[3] + n.state[6] - 12)
-    result = result + abs(n.state[1] + n.state[4] + n.state[7] - 15)
-    result = result + abs(n.state[2] + n.state[5] + n.state[8] - 9)
+    for i in range(width):
+        result = result + abs(sum(n.state[i::width]) - sum(puzzle.goal[i::width]))
     return result
 
 
@@ -0,0 +1,209 @@
+"""
+Disjoint additive pattern databases for the sliding tile puzzle.
+
+A pattern database stores, for every placement of a subset of the tiles
+(the pattern), the fewest moves of those tiles needed to bring them to their
+goal squares, whatever the other tiles do. Only moves of pattern tiles are
+counted, so the values of disjoint patterns can be added together and the sum
+is still an admissible heuristic for astar_search.
+
+The tables are built once by a breadth-first search backwards from the goal,
+saved to a small binary file in the user's cache directory and memory-mapped
+when they are loaded again. A file that is missing, damaged or built for
+another goal is rebuilt:
+    pdb = PatternDatabase()
+    astar_search(EightPuzzle(state), pdb.h)
+"""
+
+import mmap
+import os
+import struct
+from collections import deque
+
+MAGIC = b'PDB1'
+UNKNOWN = 0xFF
+
+DEFAULT_GOAL = (1, 2, 3, 4, 5, 6, 7, 8, 0)
+DEFAULT_PATTERNS = ((1, 2, 3, 4), (5, 6, 7, 8))
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                         'aima-search')
+DEFAULT_FILE = os.path.join(CACHE_DIR, 'eight_puzzle.pdb')
+
+
+def board_neighbors(width):
+    """Return a list whose i-th element is the list of squares next to square i
+    on a width x width board."""
+    neighbors = []
+    for i in range(width * width):
+        row, col = divmod(i, width)
+        squares = []
+        if row > 0:
+            squares.append(i - width)
+        if row < width - 1:
+            squares.append(i + width)
+        if col > 0:
+            squares.append(i - 1)
+        if col < width - 1:
+            squares.append(i + 1)
+        neighbors.append(squares)
+    return neighbors
+
+
+def build_pattern_table(goal, pattern, width):
+    """Return a bytearray with the number of moves of the pattern tiles needed to
+    reach the goal, indexed by sum(position of pattern[j] * cells ** j).
+    The search runs over (positions of pattern tiles, position of blank) and
+    moving a tile outside the pattern into the blank costs nothing, so it is
+    a 0-1 breadth-first search that pushes free moves to the front of the queue."""
+    cells = width * width
+    k = len(pattern)
+    neighbors = board_neighbors(width)
+    weights = [cells ** j for j in range(k)]
+    blank_weight = cells ** k
+
+    start = sum(goal.index(tile) * weights[j] for j, tile in enumerate(pattern))
+    start += goal.index(0) * blank_weight
+    distance = bytearray([UNKNOWN]) * (cells ** (k + 1))
+    distance[start] = 0
+    frontier = deque([start])
+    while frontier:
+        key = frontier.popleft()
+        d = distance[key]
+        blank, tiles_key = divmod(key, blank_weight)
+        occupied = {}
+        rest = tiles_key
+        for j in range(k):
+            rest, position = divmod(rest, cells)
+            occupied[position] = j
+        for square in neighbors[blank]:
+            j = occupied.get(square)
+            if j is None:
+                child, cost = tiles_key + square * blank_weight, 0
+            else:
+                child = tiles_key + (blank - square) * weights[j] + square * blank_weight
+                cost = 1
+            if distance[child] > d + cost:
+                distance[child] = d + cost
+                if cost:
+                    frontier.append(child)
+                else:
+                    frontier.appendleft(child)
+
+    # The heuristic does not know where the blank is, so take the best case
+    table = bytearray([UNKNOWN]) * blank_weight
+    for blank in range(cells):
+        offset = blank * blank_weight
+        for tiles_key in range(blank_weight):
+            d = distance[offset + tiles_key]
+            if d < table[tiles_key]:
+                table[tiles_key] = d
+    return table
+
+
+def save_pattern_database(filename, goal, patterns, tables):
+    """Write the tables to filename. The header holds the goal and the patterns
+    so that a file built for a different goal is never used by mistake. The
+    file is written under a temporary name and then renamed, so that another
+    process never maps a half-written file."""
+    directory = os.path.dirname(filename)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = '{}.{}.tmp'.format(filename, os.getpid())
+    try:
+        with open(temporary, 'wb') as file:
+            file.write(MAGIC)
+            file.write(struct.pack('<BB', len(goal), len(patterns)))
+            file.write(bytes(goal))
+            for pattern in patterns:
+                file.write(struct.pack('<B', len(pattern)))
+                file.write(bytes(pattern))
+            for table in tables:
+                file.write(table)
+        os.replace(temporary, filename)
+    except OSError:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def load_pattern_database(filename):
+    """Memory-map a file written by save_pattern_database and return
+    (goal, patterns, tables), where each table is a read-only memoryview.
+    Raises ValueError if the file is empty, not a pattern database or truncated."""
+    with open(filename, 'rb') as file:
+        if os.fstat(file.fileno()).st_size < len(MAGIC) + 2:
+            raise ValueError(filename + ' is not a pattern database file')
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    if data[:4] != MAGIC:
+        raise ValueError(filename + ' is not a pattern database file')
+    cells, n_patterns = struct.unpack_from('<BB', data, 4)
+    offset = 6
+    goal = tuple(data[offset:offset + cells])
+    offset += cells
+    patterns = []
+    for _ in range(n_patterns):
+        if offset >= len(data):
+            raise ValueError(filename + ' is truncated')
+        k = data[offset]
+        patterns.append(tuple(data[offset + 1:offset + 1 + k]))
+        offset += 1 + k
+    view = memoryview(data)
+    tables = []
+    for pattern in patterns:
+        size = cells ** len(pattern)
+        tables.append(view[offset:offset + size])
+        offset += size
+    if offset != len(data):
+        raise ValueError(filename + ' does not hold the tables its header describes')
+    return goal, tuple(patterns), tables
+
+
+class PatternDatabase:
+    """An additive pattern database heuristic for sliding tile puzzles with the
+    given goal. The tables are loaded from filename if it holds a database for
+    the same goal and patterns; otherwise, or if the file cannot be read, they
+    are built and saved there, replacing the file, or kept in memory only if
+    the file cannot be written. filename defaults to
+    DEFAULT_FILE in the user's cache directory ($XDG_CACHE_HOME or ~/.cache).
+    Pass filename=None to build the tables in memory only."""
+
+    def __init__(self, goal=DEFAULT_GOAL, patterns=DEFAULT_PATTERNS, filename=DEFAULT_FILE):
+        self.goal = tuple(goal)
+        self.patterns = tuple(tuple(pattern) for pattern in patterns)
+        self.cells = len(self.goal)
+        self.width = int(round(self.cells ** 0.5))
+        assert self.width * self.width == self.cells
+        self.tables = None
+        if filename and os.path.exists(filename):
+            try:
+                goal, patterns, tables = load_pattern_database(filename)
+            except (OSError, ValueError):
+                # An unreadable, stale or damaged file: rebuild it below
+                goal = patterns = None
+            if goal == self.goal and patterns == self.patterns:
+                self.tables = tables
+        if self.tables is None:
+            self.tables = [build_pattern_table(self.goal, pattern, self.width) for pattern in self.patterns]
+            if filename:
+                try:
+                    save_pattern_database(filename, self.goal, self.patterns, self.tables)
+                except OSError:
+                    # The cache directory cannot be written: keep the tables in memory only
+                    pass
+        self.weights = [[self.cells ** j for j in range(len(pattern))] for pattern in self.patterns]
+
+    def __call__(self, node):
+        return self.h(node)
+
+    def h(self, node):
+        """Return the sum of the pattern database values for the state of node"""
+        position = [0] * self.cells
+        for i, tile in enumerate(node.state):
+            position[tile] = i
+        total = 0
+        for pattern, weights, table in zip(self.patterns, self.weights, self.tables):
+            key = 0
+            for tile, weight in zip(pattern, weights):
+                key += position[tile] * weight
+            total += table[key]
+        return total
@@ -0,0 +1,130 @@
+"""
+Answering many shortest-path queries on one road map.
+
+A RouteService keeps a frozen graph and the work done for earlier queries:
+the straight-line (or landmark) heuristic table of each recent goal, complete
+Dijkstra trees for the sources and goals that keep coming back, and the
+answers themselves. Each cache is an LRU of bounded size, so memory stays
+within a few tables of one float per node:
+    service = RouteService(romania_map)
+    cost, path = service.route('Arad', 'Bucharest')
+"""
+
+import math
+from collections import OrderedDict
+
+from search import CompiledGraph, CompiledGraphProblem, Landmarks, astar_search, path_costs
+
+
+class LRUCache(OrderedDict):
+    """An OrderedDict that forgets its least recently used entries beyond maxsize.
+    Use lookup to read an entry, which also marks it as recently used."""
+
+    def __init__(self, maxsize):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def lookup(self, key):
+        """Return the value for key, or None if it is not cached"""
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+class RouteService:
+    """Answer route(initial, goal) queries on graph, a Graph or a CompiledGraph.
+
+    A query is answered, in order of preference, from the cache of recent
+    answers; from a cached Dijkstra tree rooted at its goal (on the reversed
+    links) or at its initial node; or by A* with the goal's heuristic table.
+    The second time a goal (or initial node) is asked for while it is still
+    cached, a full tree is built for it, so every later query that shares it
+    costs a walk along the tree. With landmarks > 0 the heuristic is ALT with
+    that many landmarks instead of the straight-line distance, which needs no
+    locations. The sizes bound how many answers, heuristic tables and trees
+    are kept; a table or tree takes 8 to 16 bytes per node."""
+
+    def __init__(self, graph, landmarks=0, answers=4096, heuristics=16, trees=8):
+        self.graph = graph if isinstance(graph, CompiledGraph) else graph.freeze()
+        self.answers = LRUCache(answers)
+        self.heuristics = LRUCache(heuristics)
+        self.trees = LRUCache(trees)
+        self.sources = LRUCache(4 * trees)
+        self.landmarks = None
+        self.hits = self.tree_hits = self.searches = 0
+        if landmarks:
+            start = self.graph.nodes[0]
+            self.landmarks = Landmarks(CompiledGraphProblem(start, start, self.graph), landmarks)
+
+    def route(self, initial, goal):
+        """Return (cost, path) for the cheapest route from initial to goal,
+        where path lists the nodes from initial to goal, or (inf, None) if
+        goal cannot be reached."""
+        answer = self.answers.lookup((initial, goal))
+        if answer is not None:
+            self.hits += 1
+            return answer
+        answer = self.solve(self.graph.index[initial], self.graph.index[goal])
+        self.answers[(initial, goal)] = answer
+        return answer
+
+    def solve(self, i, g):
+        """Answer a query given by node ids, from a tree or by searching"""
+        tree = self.trees.lookup(('to', g))
+        if tree is not None:
+            self.tree_hits += 1
+            return self.walk(tree, i)
+        tree = self.trees.lookup(('from', i))
+        if tree is not None:
+            self.tree_hits += 1
+            cost, path = self.walk(tree, g)
+            return cost, path and path[::-1]
+        if g in self.heuristics:
+            # The goal has come back: build its tree of cheapest paths to it
+            problem = CompiledGraphProblem(self.graph.nodes[g], self.graph.nodes[g], self.graph).reverse()
+            tree = self.trees[('to', g)] = path_costs(problem, g, parents=True)
+            return self.walk(tree, i)
+        if self.sources.lookup(i) is not None:
+            problem = CompiledGraphProblem(self.graph.nodes[i], self.graph.nodes[i], self.graph)
+            tree = self.trees[('from', i)] = path_costs(problem, i, parents=True)
+            cost, path = self.walk(tree, g)
+            return cost, path and path[::-1]
+        self.sources[i] = True
+        return self.search(i, g)
+
+    def search(self, i, g):
+        """Run A* from node i to node g with g's cached heuristic table"""
+        self.searches += 1
+        problem = CompiledGraphProblem(self.graph.nodes[i], self.graph.nodes[g], self.graph)
+        h = self.heuristics.lookup(g)
+        if h is None:
+            if self.landmarks is not None:
+                h = self.landmarks.heuristic(g)
+            elif self.graph.x is not None:
+                table = problem.straight_line_distances()
+                h = lambda node: table[node.state]
+            else:
+                h = lambda node: 0
+            self.heuristics[g] = h
+        node = astar_search(problem, h)
+        if node is None:
+            return math.inf, None
+        return node.path_cost, [self.graph.nodes[n.state] for n in node.path()]
+
+    def walk(self, tree, i):
+        """Return (cost, path) from node i to the root of a tree from
+        path_costs, where path lists the nodes from i to the root"""
+        costs, parents = tree
+        if costs[i] == math.inf:
+            return math.inf, None
+        path = [i]
+        while parents[path[-1]] != -1:
+            path.append(parents[path[-1]])
+        return costs[i], [self.graph.nodes[n] for n in path]
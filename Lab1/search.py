@@ -4,11 +4,20 @@ Search (Chapters 3-4)
 The way to use this code is to subclass Problem to create a class of problems,
 then create problem instances and solve them with calls to the various search
 functions.
+
+The example graphs (romania_map, australia_map, vacuum_world and
+one_dim_state_space) are built on first use, with example_graph(name) or as
+attributes such as search.romania_map. Unlike older versions of this module,
+"from search import *" never exports them, whether or not they have been
+built; take them from example_graph instead.
 """
 
+import copy
+import math
 import sys
+import time
+from array import array
 from collections import deque
-import datetime
 
 from utils import *
 
@@ -62,6 +71,17 @@ class Problem:
         and related algorithms try to maximize this value."""
         raise NotImplementedError
 
+    def reverse(self):
+        """Return the problem of getting from the goal back to the initial
+        state: its actions lead from a state to the states it can be reached
+        from, at the same cost. Needed by bidirectional_search."""
+        raise NotImplementedError
+
+    def undo(self, state, action):
+        """Return the action of self.reverse() that leads back to state from
+        self.result(state, action). Needed by bidirectional_search."""
+        raise NotImplementedError
+
 
 # ______________________________________________________________________________
 
@@ -100,7 +120,8 @@ class Node:
     def child_node(self, problem, action):
         """[Figure 3.10]"""
         next_state = problem.result(self.state, action)
-        next_node = Node(next_state, self, action, problem.path_cost(self.path_cost, self.state, action, next_state))
+        next_node = type(self)(next_state, self, action,
+                               problem.path_cost(self.path_cost, self.state, action, next_state))
         return next_node
 
     def solution(self):
@@ -131,6 +152,56 @@ class Node:
         return hash(self.state)
 
 
+class SlottedNode:
+    """A Node with __slots__ instead of a per-instance dict, for searches that keep
+    millions of nodes alive. Besides the fields of Node it has fixed h and f
+    fields, which memoize and astar_search fill in as usual; no other attribute
+    can be added to it. Pass node_class=SlottedNode to a search function."""
+
+    __slots__ = ('state', 'parent', 'action', 'path_cost', 'depth', 'h', 'f')
+
+    def __init__(self, state, parent=None, action=None, path_cost=0):
+        """Create a search tree Node, derived from a parent by an action."""
+        self.state = state
+        self.parent = parent
+        self.action = action
+        self.path_cost = path_cost
+        self.depth = parent.depth + 1 if parent else 0
+
+    __repr__ = Node.__repr__
+    __lt__ = Node.__lt__
+    __hash__ = Node.__hash__
+    expand = Node.expand
+    child_node = Node.child_node
+    solution = Node.solution
+    path = Node.path
+
+    def __eq__(self, other):
+        return isinstance(other, SlottedNode) and self.state == other.state
+
+
+def compact_node_class(actions):
+    """Return a SlottedNode class that stores the action leading to each node as
+    its index in actions, a small int, instead of a reference to the action
+    itself; solution() translates the indices back. actions must list every
+    action of the problem, e.g. compact_node_class(('UP', 'DOWN', 'LEFT', 'RIGHT'))."""
+    actions = tuple(actions)
+    codes = {action: code for code, action in enumerate(actions)}
+
+    class CompactNode(SlottedNode):
+        __slots__ = ()
+
+        def child_node(self, problem, action):
+            next_state = problem.result(self.state, action)
+            return CompactNode(next_state, self, codes[action],
+                               problem.path_cost(self.path_cost, self.state, action, next_state))
+
+        def solution(self):
+            return [actions[node.action] for node in self.path()[1:]]
+
+    return CompactNode
+
+
 # ______________________________________________________________________________
 
 
@@ -172,11 +243,121 @@ class SimpleProblemSolvingAgentProgram:
         raise NotImplementedError
 
 
+# ______________________________________________________________________________
+# Search statistics and budgets
+
+
+class SearchStats:
+    """Statistics of one call of a search function. Create one per call, pass it
+    as the stats argument and read it afterwards:
+        stats = SearchStats()
+        node = astar_search(problem, stats=stats)
+        print(stats.nodes_expanded, stats.elapsed, stats.reason)
+    reason is 'goal', 'exhausted' if there was nothing left to search,
+    'cutoff' if depth_limited_search hit its limit, or the limit of the
+    Budget that ran out: 'time', 'expansions', 'states' or 'cancelled'."""
+
+    def __init__(self):
+        self.nodes_generated = 0
+        self.nodes_expanded = 0
+        self.max_frontier = 0
+        self.elapsed = 0.0
+        self.reason = None
+        self.start_time = None
+
+    def __repr__(self):
+        return '<SearchStats {} generated={} expanded={} max_frontier={} elapsed={:.3f}s>'.format(
+            self.reason, self.nodes_generated, self.nodes_expanded, self.max_frontier, self.elapsed)
+
+    def start(self):
+        """Start the clock, unless an enclosing search has already started it."""
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        return self
+
+    def finish(self, reason, result):
+        """Record why the search stopped and how long it took; return result."""
+        self.reason = reason
+        self.elapsed = time.perf_counter() - self.start_time
+        return result
+
+    def out_of_budget(self, reason, node):
+        """Finish with a BudgetExceeded result for the limit that ran out."""
+        return self.finish(reason, BudgetExceeded(reason, node, self))
+
+
+class Budget:
+    """Limits on one call of a search function: max_seconds of wall-clock time,
+    max_expansions nodes expanded and max_states states held in memory at once
+    (frontier plus explored set, or the current path for depth-first searches).
+    A limit of None is not checked. cancel may be a threading or multiprocessing
+    Event; the search stops once it is set, which lets another thread or process
+    call it off. Every search function takes a Budget as budget:
+        result = astar_search(problem, budget=Budget(max_seconds=0.5))"""
+
+    # The clock is read once every check_interval expansions
+    check_interval = 1024
+
+    def __init__(self, max_seconds=None, max_expansions=None, max_states=None, cancel=None):
+        self.max_seconds = max_seconds
+        self.max_expansions = max_expansions
+        self.max_states = max_states
+        self.cancel = cancel
+
+    def __repr__(self):
+        return '<Budget seconds={} expansions={} states={}>'.format(
+            self.max_seconds, self.max_expansions, self.max_states)
+
+    def exceeded(self, stats, states=0):
+        """Return the name of the limit that stats (with states resident states)
+        has run past, or None while the search is within budget."""
+        if self.max_expansions is not None and stats.nodes_expanded >= self.max_expansions:
+            return 'expansions'
+        if self.max_states is not None and states > self.max_states:
+            return 'states'
+        if stats.nodes_expanded % self.check_interval == 0:
+            if self.max_seconds is not None and time.perf_counter() - stats.start_time >= self.max_seconds:
+                return 'time'
+            if self.cancel is not None and self.cancel.is_set():
+                return 'cancelled'
+        return None
+
+
+class BudgetExceeded:
+    """The result of a search that ran out of budget. reason is the limit that
+    ran out, node the most promising node reached (the one the search would
+    have expanded next, or the end of the current path for depth-first
+    searches) and stats the SearchStats of the search. It is false in a
+    boolean context, like the None returned when there is no solution."""
+
+    def __init__(self, reason, node, stats):
+        self.reason = reason
+        self.node = node
+        self.stats = stats
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return '<BudgetExceeded {} {}>'.format(self.reason, self.node)
+
+
+def print_results(stats):
+    """Print out some of expected outputs with timeout message"""
+    seconds, microseconds = divmod(int(stats.elapsed * 1000000), 1000000)
+    print('Total nodes generated:', stats.nodes_generated)
+    print('Total time taken:', seconds, "sec", microseconds, "microSec.")
+    if stats.reason in ('time', 'expansions', 'states', 'cancelled'):
+        message = 'Timed out.' if stats.reason == 'time' else 'Out of {}.'.format(stats.reason)
+        print('Path length:', message)
+        print('Path:', message)
+
+
 # ______________________________________________________________________________
 # Uninformed Search algorithms
 
 
-def breadth_first_tree_search(problem):
+def breadth_first_tree_search(problem, stats=None, budget=None):
     """
     [Figure 3.7]
     Search the shallowest nodes in the search tree first.
@@ -184,20 +365,26 @@ def breadth_first_tree_search(problem):
     The argument frontier should be an empty queue.
     Repeats infinitely in case of loops.
     """
-
+    stats = (stats or SearchStats()).start()
     frontier = deque([Node(problem.initial)])  # FIFO queue
-    explored = set()
 
     while frontier:
+        if budget is not None:
+            reason = budget.exceeded(stats, len(frontier))
+            if reason:
+                return stats.out_of_budget(reason, frontier[0])
         node = frontier.popleft()
         if problem.goal_test(node.state):
-            return node
-        explored.add(node.state)
-        frontier.extend(node.expand(problem))
-    return None
+            return stats.finish('goal', node)
+        stats.nodes_expanded += 1
+        children = node.expand(problem)
+        stats.nodes_generated += len(children)
+        frontier.extend(children)
+        stats.max_frontier = max(stats.max_frontier, len(frontier))
+    return stats.finish('exhausted', None)
 
 
-def depth_first_tree_search(problem):
+def depth_first_tree_search(problem, stats=None, budget=None):
     """
     [Figure 3.7]
     Search the deepest nodes in the search tree first.
@@ -205,18 +392,26 @@ def depth_first_tree_search(problem):
     The argument frontier should be an empty queue.
     Repeats infinitely in case of loops.
     """
-
+    stats = (stats or SearchStats()).start()
     frontier = [Node(problem.initial)]  # Stack
 
     while frontier:
+        if budget is not None:
+            reason = budget.exceeded(stats, len(frontier))
+            if reason:
+                return stats.out_of_budget(reason, frontier[-1])
         node = frontier.pop()
         if problem.goal_test(node.state):
-            return node
-        frontier.extend(node.expand(problem))
-    return None
+            return stats.finish('goal', node)
+        stats.nodes_expanded += 1
+        children = node.expand(problem)
+        stats.nodes_generated += len(children)
+        frontier.extend(children)
+        stats.max_frontier = max(stats.max_frontier, len(frontier))
+    return stats.finish('exhausted', None)
 
 
-def depth_first_graph_search(problem):
+def depth_first_graph_search(problem, stats=None, budget=None):
     """
     [Figure 3.7]
     Search the deepest nodes in the search tree first.
@@ -225,151 +420,167 @@ def depth_first_graph_search(problem):
     Does not get trapped by loops.
     If two paths reach a state, only use the first one.
     """
+    stats = (stats or SearchStats()).start()
     frontier = [(Node(problem.initial))]  # Stack
 
-    explored = set()
+    # States that are either explored or on the frontier, so that a child
+    # can be checked against both with a single hash lookup.
+    reached = {problem.initial}
     while frontier:
+        if budget is not None:
+            reason = budget.exceeded(stats, len(reached))
+            if reason:
+                return stats.out_of_budget(reason, frontier[-1])
         node = frontier.pop()
         if problem.goal_test(node.state):
-            return node
-        explored.add(node.state)
-        frontier.extend(child for child in node.expand(problem)
-                        if child.state not in explored and child not in frontier)
-    return None
+            return stats.finish('goal', node)
+        stats.nodes_expanded += 1
+        for child in node.expand(problem):
+            stats.nodes_generated += 1
+            if child.state not in reached:
+                reached.add(child.state)
+                frontier.append(child)
+        stats.max_frontier = max(stats.max_frontier, len(frontier))
+    return stats.finish('exhausted', None)
 
 
-def breadth_first_graph_search(problem):
+def breadth_first_graph_search(problem, stats=None, budget=None):
     """[Figure 3.11]
     Note that this function can be implemented in a
     single line as below:
     return graph_search(problem, FIFOQueue())
     """
+    stats = (stats or SearchStats()).start()
     node = Node(problem.initial)
-    explored = set()
-    start = datetime.datetime.now()
     if problem.goal_test(node.state):
-        end = datetime.datetime.now()
-        time = end - start
-        print_results(explored, time)
-        return node
+        return stats.finish('goal', node)
+    explored = set()
     frontier = deque([node])
+    # States on the frontier, kept in sync with it so that
+    # membership is a hash lookup rather than a scan of the deque.
+    frontier_states = {node.state}
     while frontier:
-        if len(explored) % 10000:
-            end = datetime.datetime.now()
-            time = end - start
-            if time.seconds >= 15*60:
-                print_results(explored, time)
-                return []
+        if budget is not None:
+            reason = budget.exceeded(stats, len(explored) + len(frontier))
+            if reason:
+                return stats.out_of_budget(reason, frontier[0])
         node = frontier.popleft()
+        frontier_states.discard(node.state)
         explored.add(node.state)
+        stats.nodes_expanded += 1
         for child in node.expand(problem):
-            if child.state not in explored and child not in frontier:
+            stats.nodes_generated += 1
+            if child.state not in explored and child.state not in frontier_states:
                 if problem.goal_test(child.state):
-                    end = datetime.datetime.now()
-                    time = end - start
-                    print_results(explored, time)
-                    return child
+                    return stats.finish('goal', child)
                 frontier.append(child)
-    return None
-
-
-def print_results(explored, time):
-    """Print out some of expected outputs with timeout message"""
-    if time.seconds >= 60*15:
-        print('Total nodes generated: <<??>>')
-        print('Total time taken: >15 min')
-        print('Path length: Timed out.')
-        print('Path: Timed out.')
-        return
+                frontier_states.add(child.state)
+        stats.max_frontier = max(stats.max_frontier, len(frontier))
+    return stats.finish('exhausted', None)
 
-    print('Total nodes generated:', len(explored))
-    print('Total time taken:', time.seconds, "sec", time.microseconds, "microSec.")
 
-
-def best_first_graph_search(problem, f, display=False):
+def best_first_graph_search(problem, f, display=False, stats=None, budget=None, node_class=Node):
     """Search the nodes with the lowest f scores first.
     You specify the function f(node) that you want to minimize; for example,
     if f is a heuristic estimate to the goal, then we have greedy best
     first search; if f is node.depth then we have breadth-first search.
     There is a subtlety: the line "f = memoize(f, 'f')" means that the f
     values will be cached on the nodes as they are computed. So after doing
-    a best first search you can examine the f values of the path returned."""
+    a best first search you can examine the f values of the path returned.
+    node_class is the class of the search tree nodes, e.g. SlottedNode."""
+    stats = (stats or SearchStats()).start()
     f = memoize(f, 'f')
-    node = Node(problem.initial)
-    frontier = PriorityQueue('min', f)
+    node = node_class(problem.initial)
+    frontier = IndexedPriorityQueue('min', f)
     frontier.append(node)
     explored = set()
-    start = datetime.datetime.now()
     while frontier:
-        if len(explored) % 10000:
-            end = datetime.datetime.now()
-            time = end - start
-            if time.seconds >= 15*60:
-                print_results(explored, time)
-                return []
+        if budget is not None:
+            reason = budget.exceeded(stats, len(explored) + len(frontier))
+            if reason:
+                return stats.out_of_budget(reason, frontier.pop())
         node = frontier.pop()
         if problem.goal_test(node.state):
+            stats.finish('goal', node)
             if display:
-                end = datetime.datetime.now()
-                time = end - start
-                print_results(explored, time)
+                print_results(stats)
             return node
         explored.add(node.state)
+        stats.nodes_expanded += 1
         for child in node.expand(problem):
+            stats.nodes_generated += 1
             if child.state not in explored and child not in frontier:
                 frontier.append(child)
             elif child in frontier:
                 if f(child) < frontier[child]:
                     del frontier[child]
                     frontier.append(child)
-    return None
+        stats.max_frontier = max(stats.max_frontier, len(frontier))
+    return stats.finish('exhausted', None)
 
 
-def uniform_cost_search(problem, display=False):
+def uniform_cost_search(problem, display=False, stats=None, budget=None, node_class=Node):
     """[Figure 3.14]"""
-    return best_first_graph_search(problem, lambda node: node.path_cost, display)
-
+    return best_first_graph_search(problem, lambda node: node.path_cost, display, stats, budget, node_class)
+
+
+def depth_limited_search(problem, limit=50, stats=None, budget=None, check_cycles=False):
+    """[Figure 3.17]
+    Written with an explicit stack instead of recursion, so deep limits do not
+    run into Python's recursion limit. Each entry holds a node on the current
+    path and an iterator over the actions not yet tried from it. With
+    check_cycles=True, children whose state is already on the current path are
+    skipped. Pass a SearchStats as stats to count the nodes generated and expanded."""
+    stats = (stats or SearchStats()).start()
+    root = Node(problem.initial)
+    if problem.goal_test(root.state):
+        return stats.finish('goal', root)
+    if limit == 0:
+        return stats.finish('cutoff', 'cutoff')
+
+    cutoff_occurred = False
+    on_path = {root.state}
+    stack = [(root, iter(problem.actions(root.state)))]
+    stats.nodes_expanded += 1
+    while stack:
+        node, actions = stack[-1]
+        for action in actions:
+            child = node.child_node(problem, action)
+            stats.nodes_generated += 1
+            if check_cycles and child.state in on_path:
+                continue
+            if problem.goal_test(child.state):
+                return stats.finish('goal', child)
+            if child.depth >= limit:
+                cutoff_occurred = True
+                continue
+            if budget is not None:
+                reason = budget.exceeded(stats, len(stack))
+                if reason:
+                    return stats.out_of_budget(reason, node)
+            stack.append((child, iter(problem.actions(child.state))))
+            stats.nodes_expanded += 1
+            stats.max_frontier = max(stats.max_frontier, len(stack))
+            if check_cycles:
+                on_path.add(child.state)
+            break
+        else:
+            stack.pop()
+            if check_cycles:
+                on_path.discard(node.state)
+    if cutoff_occurred:
+        return stats.finish('cutoff', 'cutoff')
+    return stats.finish('exhausted', None)
 
-def depth_limited_search(problem, limit=50, explored=set()):
-    """[Figure 3.17]"""
 
-    def recursive_dls(node, problem, limit):
-        if problem.goal_test(node.state):
-            return node
-        elif limit == 0:
-            return 'cutoff'
-        else:
-            cutoff_occurred = False
-            for child in node.expand(problem):
-                explored.add(child.state)
-                result = recursive_dls(child, problem, limit - 1)
-                if result == 'cutoff':
-                    cutoff_occurred = True
-                elif result is not None:
-                    return result
-            return 'cutoff' if cutoff_occurred else None
-
-    # Body of depth_limited_search:
-    return recursive_dls(Node(problem.initial), problem, limit)
-
-
-def iterative_deepening_search(problem):
-    """[Figure 3.18]"""
-    explored = set()
-    start = datetime.datetime.now()
+def iterative_deepening_search(problem, stats=None, budget=None, check_cycles=False):
+    """[Figure 3.18]
+    The budget covers all the depth-limited searches together."""
+    stats = (stats or SearchStats()).start()
 
     for depth in range(sys.maxsize):
-        if len(explored) % 10000:
-            end = datetime.datetime.now()
-            time = end - start
-            if time.seconds >= 15*60:
-                print_results(explored, time)
-                return []
-        result = depth_limited_search(problem, depth, explored)
+        result = depth_limited_search(problem, depth, stats, budget, check_cycles)
         if result != 'cutoff':
-            end = datetime.datetime.now()
-            time = end - start
-            print_results(explored, time)
             return result
 
 
@@ -377,80 +588,95 @@ def iterative_deepening_search(problem):
 # Bidirectional Search
 # Pseudocode from https://webdocs.cs.ualberta.ca/%7Eholte/Publications/MM-AAAI2016.pdf
 
-def bidirectional_search(problem):
-    e = 0
-    if isinstance(problem, GraphProblem):
-        e = problem.find_min_edge()
-    gF, gB = {Node(problem.initial): 0}, {Node(problem.goal): 0}
-    openF, openB = [Node(problem.initial)], [Node(problem.goal)]
-    closedF, closedB = [], []
-    U = np.inf
-
-    def extend(U, open_dir, open_other, g_dir, g_other, closed_dir):
-        """Extend search in given direction"""
-        n = find_key(C, open_dir, g_dir)
-
-        open_dir.remove(n)
-        closed_dir.append(n)
-
-        for c in n.expand(problem):
-            if c in open_dir or c in closed_dir:
-                if g_dir[c] <= problem.path_cost(g_dir[n], n.state, None, c.state):
-                    continue
-
-                open_dir.remove(c)
-
-            g_dir[c] = problem.path_cost(g_dir[n], n.state, None, c.state)
-            open_dir.append(c)
-
-            if c in open_other:
-                U = min(U, g_dir[c] + g_other[c])
-
-        return U, open_dir, closed_dir, g_dir
-
-    def find_min(open_dir, g):
-        """Finds minimum priority, g and f values in open_dir"""
-        # pr_min_f isn't forward pr_min instead it's the f-value
-        # of node with priority pr_min.
-        pr_min, pr_min_f = np.inf, np.inf
-        for n in open_dir:
-            f = g[n] + problem.h(n)
-            pr = max(f, 2 * g[n])
-            pr_min = min(pr_min, pr)
-            pr_min_f = min(pr_min_f, f)
-
-        return pr_min, pr_min_f, min(g.values())
-
-    def find_key(pr_min, open_dir, g):
-        """Finds key in open_dir with value equal to pr_min
-        and minimum g value."""
-        m = np.inf
-        node = Node(-1)
-        for n in open_dir:
-            pr = max(g[n] + problem.h(n), 2 * g[n])
-            if pr == pr_min:
-                if g[n] < m:
-                    m = g[n]
-                    node = n
-
-        return node
-
-    while openF and openB:
-        pr_min_f, f_min_f, g_min_f = find_min(openF, gF)
-        pr_min_b, f_min_b, g_min_b = find_min(openB, gB)
-        C = min(pr_min_f, pr_min_b)
+def bidirectional_search(problem, h=None, h_backward=None, epsilon=None, stats=None, budget=None):
+    """MM: search forward from the initial state and backward from the goal,
+    always expanding the node with the lowest priority max(g + h, 2g) in either
+    direction, until the cheapest path found where the two searches meet cannot
+    be improved. Returns the goal Node of that path, as the other searches do.
+    The backward search runs on problem.reverse(), whose actions are turned back
+    into actions of problem by its undo method.
+    h estimates the cost to the goal and defaults to problem.h; h_backward
+    estimates the cost from the initial state and defaults to the h of the
+    reversed problem. epsilon is the cost of the cheapest action, which lets the
+    search stop earlier; it defaults to the shortest edge of a GraphProblem."""
+    stats = (stats or SearchStats()).start()
+    reverse = problem.reverse()
+    if isinstance(problem, GraphProblem) and problem.h(Node(problem.initial)) == math.inf:
+        # GraphProblem.h is infinite without locations, which would stop MM at the first meeting
+        h, h_backward = h or (lambda n: 0), h_backward or (lambda n: 0)
+    h = memoize(h or problem.h, 'h')
+    h_backward = memoize(h_backward or reverse.h, 'h')
+    if epsilon is None:
+        epsilon = problem.find_min_edge() if isinstance(problem, GraphProblem) else 0
 
-        if U <= max(C, f_min_f, f_min_b, g_min_f + g_min_b + e):
-            return U
+    node = Node(problem.initial)
+    if problem.goal_test(node.state):
+        return stats.finish('goal', node)
+
+    def frontier(h):
+        """The open list of one direction: every node is queued three times, by
+        priority, by f and by g, so that the smallest of each is found in O(log n)"""
+        return (IndexedPriorityQueue('min', lambda n: max(n.path_cost + h(n), 2 * n.path_cost)),
+                IndexedPriorityQueue('min', lambda n: n.path_cost + h(n)),
+                IndexedPriorityQueue('min', lambda n: n.path_cost))
+
+    def smallest(queue):
+        return queue[queue.peek()] if queue else math.inf
+
+    # Each direction has its problem, open queues and a dict from each state it
+    # has reached, open or closed, to the cheapest node found for it
+    forward = (problem, frontier(h), {node.state: node})
+    backward = (reverse, frontier(h_backward), {reverse.initial: Node(reverse.initial)})
+    for _, queues, reached in (forward, backward):
+        for queue in queues:
+            queue.extend(reached.values())
+
+    (open_f, f_f, g_f), (open_b, f_b, g_b) = forward[1], backward[1]
+    U, meeting = math.inf, None
+    while open_f and open_b:
+        if budget is not None:
+            reason = budget.exceeded(stats, len(forward[2]) + len(backward[2]))
+            if reason:
+                return stats.out_of_budget(reason, open_f.peek())
+        C = min(smallest(open_f), smallest(open_b))
+        if U <= max(C, smallest(f_f), smallest(f_b), smallest(g_f) + smallest(g_b) + epsilon):
+            break
 
-        if C == pr_min_f:
-            # Extend forward
-            U, openF, closedF, gF = extend(U, openF, openB, gF, gB, closedF)
+        if smallest(open_f) == C:
+            (direction_problem, queues, reached), (_, _, other_reached) = forward, backward
         else:
-            # Extend backward
-            U, openB, closedB, gB = extend(U, openB, openF, gB, gF, closedB)
-
-    return np.inf
+            (direction_problem, queues, reached), (_, _, other_reached) = backward, forward
+        node = queues[0].pop()
+        for queue in queues[1:]:
+            del queue[node]
+        stats.nodes_expanded += 1
+        for child in node.expand(direction_problem):
+            stats.nodes_generated += 1
+            known = reached.get(child.state)
+            if known is not None:
+                if known.path_cost <= child.path_cost:
+                    continue
+                if known in queues[0]:
+                    for queue in queues:
+                        del queue[known]
+            reached[child.state] = child
+            for queue in queues:
+                queue.append(child)
+            other = other_reached.get(child.state)
+            if other is not None and child.path_cost + other.path_cost < U:
+                U = child.path_cost + other.path_cost
+                meeting = child.state
+        stats.max_frontier = max(stats.max_frontier, len(open_f) + len(open_b))
+
+    if meeting is None:
+        return stats.finish('exhausted', None)
+    # Follow the backward half of the path from the meeting point to the goal
+    node = forward[2][meeting]
+    back = backward[2][meeting]
+    while back.parent is not None:
+        node = node.child_node(problem, reverse.undo(back.parent.state, back.action))
+        back = back.parent
+    return stats.finish('goal', node)
 
 
 # ______________________________________________________________________________
@@ -463,25 +689,225 @@ greedy_best_first_graph_search = best_first_graph_search
 # Greedy best-first search is accomplished by specifying f(n) = h(n).
 
 
-def astar_search(problem, h=None, display=False):
+def astar_search(problem, h=None, display=False, stats=None, budget=None, node_class=Node):
     """A* search is best-first graph search with f(n) = g(n)+h(n).
     You need to specify the h function when you call astar_search, or
     else in your Problem subclass."""
     h = memoize(h or problem.h, 'h')
-    return best_first_graph_search(problem, lambda n: n.path_cost + h(n), display)
+    return best_first_graph_search(problem, lambda n: n.path_cost + h(n), display, stats, budget, node_class)
+
+
+def ida_star_search(problem, h=None, stats=None, budget=None):
+    """Iterative deepening A* search: a depth-first search that skips nodes with
+    f(n) = g(n)+h(n) above a bound, repeated with the bound raised to the smallest
+    f that exceeded it until a goal is found. Only the current path is kept in
+    memory: the stack holds each node on the path with an iterator over the actions
+    not yet tried from it, and backtracking just pops it. States already on the
+    path are skipped, so the search does not walk in cycles."""
+    stats = (stats or SearchStats()).start()
+    h = h or problem.h
+    root = Node(problem.initial)
+    if problem.goal_test(root.state):
+        return stats.finish('goal', root)
+    bound = root.path_cost + h(root)
+    while bound < math.inf:
+        next_bound = math.inf
+        on_path = {root.state}
+        stack = [(root, iter(problem.actions(root.state)))]
+        stats.nodes_expanded += 1
+        while stack:
+            node, actions = stack[-1]
+            for action in actions:
+                child = node.child_node(problem, action)
+                stats.nodes_generated += 1
+                if child.state in on_path:
+                    continue
+                f = child.path_cost + h(child)
+                if f > bound:
+                    next_bound = min(next_bound, f)
+                    continue
+                if problem.goal_test(child.state):
+                    return stats.finish('goal', child)
+                if budget is not None:
+                    reason = budget.exceeded(stats, len(stack))
+                    if reason:
+                        return stats.out_of_budget(reason, node)
+                on_path.add(child.state)
+                stack.append((child, iter(problem.actions(child.state))))
+                stats.nodes_expanded += 1
+                stats.max_frontier = max(stats.max_frontier, len(stack))
+                break
+            else:
+                # Every action has been tried: undo the last step
+                stack.pop()
+                on_path.discard(node.state)
+        bound = next_bound
+    return stats.finish('exhausted', None)
 
 
 # ______________________________________________________________________________
-# A* heuristics 
+# Searches over a node arena
 
-class EightPuzzle(Problem):
-    """ The problem of sliding tiles numbered from 1 to 8 on a 3x3 board, where one of the
-    squares is a blank. A state is represented as a tuple of length 9, where  element at
-    index i represents the tile number  at index i (0 if it's an empty square) """
 
-    def __init__(self, initial, goal=(1, 2, 3, 4, 5, 6, 7, 8, 0)):
-        """ Define goal state and initialize a problem """
+class NodeArena:
+    """Search tree nodes stored column by column instead of one Node object each.
+    A node is an int id; its state, parent id, action code, g and f are entries
+    in parallel arrays, and each distinct action is stored once in actions.
+    node(i) rebuilds the ordinary Node chain from the root to node i, so the
+    Node objects are only created for the solution path."""
+
+    NO_PARENT = -1
+
+    def __init__(self):
+        self.states = []
+        self.parents = array('q')
+        self.action_codes = array('l')
+        self.g = array('d')
+        self.f = array('d')
+        self.actions = []
+        self.codes = {}
+
+    def __len__(self):
+        return len(self.states)
+
+    def add(self, state, parent=NO_PARENT, action=None, g=0.0, f=0.0):
+        """Store a node and return its id."""
+        code = self.codes.get(action)
+        if code is None:
+            code = self.codes[action] = len(self.actions)
+            self.actions.append(action)
+        self.states.append(state)
+        self.parents.append(parent)
+        self.action_codes.append(code)
+        self.g.append(g)
+        self.f.append(f)
+        return len(self.states) - 1
+
+    def node(self, i):
+        """Return node i as a Node whose parents lead back to the root."""
+        ids = []
+        while i != self.NO_PARENT:
+            ids.append(i)
+            i = self.parents[i]
+        node = None
+        for i in reversed(ids):
+            action = self.actions[self.action_codes[i]] if node else None
+            g = self.g[i]
+            node = Node(self.states[i], node, action, int(g) if g.is_integer() else g)
+        return node
+
+
+def arena_breadth_first_graph_search(problem, stats=None, budget=None):
+    """breadth_first_graph_search over a NodeArena. Nodes are added to the arena
+    in the order they are expanded, so the frontier is just the ids from the
+    next one to expand to the last one added."""
+    stats = (stats or SearchStats()).start()
+    arena = NodeArena()
+    arena.add(problem.initial)
+    if problem.goal_test(problem.initial):
+        return stats.finish('goal', arena.node(0))
+    reached = {problem.initial}
+    states, g = arena.states, arena.g
+    head = 0
+    while head < len(arena):
+        if budget is not None:
+            reason = budget.exceeded(stats, len(reached))
+            if reason:
+                return stats.out_of_budget(reason, arena.node(head))
+        state = states[head]
+        stats.nodes_expanded += 1
+        for action in problem.actions(state):
+            child = problem.result(state, action)
+            stats.nodes_generated += 1
+            if child not in reached:
+                reached.add(child)
+                i = arena.add(child, head, action, problem.path_cost(g[head], state, action, child))
+                if problem.goal_test(child):
+                    return stats.finish('goal', arena.node(i))
+        head += 1
+        stats.max_frontier = max(stats.max_frontier, len(arena) - head)
+    return stats.finish('exhausted', None)
+
+
+def arena_best_first_graph_search(problem, f, stats=None, budget=None):
+    """best_first_graph_search over a NodeArena. f(state, g) is the priority of
+    a node with the given state and path cost. The frontier is a heap of
+    (f, id) pairs; an entry is skipped when it is popped if a cheaper node for
+    its state has been added since, instead of being removed from the heap."""
+    stats = (stats or SearchStats()).start()
+    arena = NodeArena()
+    states, g = arena.states, arena.g
+    best = {problem.initial: arena.add(problem.initial, f=f(problem.initial, 0))}
+    frontier = [(arena.f[0], 0)]
+    explored = set()
+    while frontier:
+        if budget is not None:
+            reason = budget.exceeded(stats, len(best) + len(explored))
+            if reason:
+                return stats.out_of_budget(reason, arena.node(frontier[0][1]))
+        _, i = heapq.heappop(frontier)
+        state = states[i]
+        if best.get(state) != i:
+            continue
+        if problem.goal_test(state):
+            return stats.finish('goal', arena.node(i))
+        del best[state]
+        explored.add(state)
+        stats.nodes_expanded += 1
+        for action in problem.actions(state):
+            child = problem.result(state, action)
+            stats.nodes_generated += 1
+            if child in explored:
+                continue
+            child_g = problem.path_cost(g[i], state, action, child)
+            if child in best and g[best[child]] <= child_g:
+                continue
+            child_f = f(child, child_g)
+            best[child] = arena.add(child, i, action, child_g, child_f)
+            heapq.heappush(frontier, (child_f, best[child]))
+        stats.max_frontier = max(stats.max_frontier, len(best))
+    return stats.finish('exhausted', None)
+
+
+def arena_astar_search(problem, h=None, stats=None, budget=None):
+    """astar_search over a NodeArena. Here h is a function of the state; by
+    default it calls problem.h on a Node holding the state."""
+    h = h or (lambda state: problem.h(Node(state)))
+    return arena_best_first_graph_search(problem, lambda state, g: g + h(state), stats, budget)
+
+
+# ______________________________________________________________________________
+# A* heuristics 
+
+class NPuzzle(Problem):
+    """ The problem of sliding tiles numbered from 1 to n*n - 1 on an n x n board, where
+    one of the squares is a blank. A state is represented as a tuple of length n*n, where
+    element at index i represents the tile number at index i (0 if it's an empty square).
+    The default goal has the tiles in order with the blank in the last square """
+
+    def __init__(self, n, initial, goal=None):
+        """ Define goal state and initialize a problem. The squares reachable from
+        each position of the blank are computed once, here, for actions and result """
+        if goal is None:
+            goal = tuple(range(1, n * n)) + (0,)
         super().__init__(initial, goal)
+        self.n = n
+        self.delta = {'UP': -n, 'DOWN': n, 'LEFT': -1, 'RIGHT': 1}
+        self.opposite = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+        # neighbor[blank][action] is the square the blank moves to
+        self.neighbor = []
+        for blank in range(n * n):
+            moves = {}
+            if blank >= n:
+                moves['UP'] = blank - n
+            if blank < n * n - n:
+                moves['DOWN'] = blank + n
+            if blank % n != 0:
+                moves['LEFT'] = blank - 1
+            if blank % n != n - 1:
+                moves['RIGHT'] = blank + 1
+            self.neighbor.append(moves)
+        self.blank_actions = [tuple(moves) for moves in self.neighbor]
 
     def find_blank_square(self, state):
         """Return the index of the blank square in a given state"""
@@ -490,22 +916,10 @@ class EightPuzzle(Problem):
 
     def actions(self, state):
         """ Return the actions that can be executed in the given state.
-        The result would be a list, since there are only four possible actions
+        The result would be a tuple, since there are only four possible actions
         in any given state of the environment """
 
-        possible_actions = ['UP', 'DOWN', 'LEFT', 'RIGHT']
-        index_blank_square = self.find_blank_square(state)
-
-        if index_blank_square % 3 == 0:
-            possible_actions.remove('LEFT')
-        if index_blank_square < 3:
-            possible_actions.remove('UP')
-        if index_blank_square % 3 == 2:
-            possible_actions.remove('RIGHT')
-        if index_blank_square > 5:
-            possible_actions.remove('DOWN')
-
-        return possible_actions
+        return self.blank_actions[self.find_blank_square(state)]
 
     def result(self, state, action):
         """ Given state and action, return a new state that is the result of the action.
@@ -513,10 +927,8 @@ class EightPuzzle(Problem):
 
         # blank is the index of the blank square
         blank = self.find_blank_square(state)
+        neighbor = self.neighbor[blank][action]
         new_state = list(state)
-
-        delta = {'UP': -3, 'DOWN': 3, 'LEFT': -1, 'RIGHT': 1}
-        neighbor = blank + delta[action]
         new_state[blank], new_state[neighbor] = new_state[neighbor], new_state[blank]
 
         return tuple(new_state)
@@ -526,24 +938,220 @@ class EightPuzzle(Problem):
 
         return state == self.goal
 
-    def check_solvability(self, state):
-        """ Checks if the given state is solvable """
+    def parity(self, state):
+        """ Return the parity of the number of inversions among the tiles, plus, on boards
+        of even width, the row of the blank. Moves never change it """
 
         inversion = 0
-        for i in range(len(state)):
-            for j in range(i + 1, len(state)):
-                if (state[i] > state[j]) and state[i] != 0 and state[j] != 0:
+        tiles = [tile for tile in state if tile != 0]
+        for i in range(len(tiles)):
+            for j in range(i + 1, len(tiles)):
+                if tiles[i] > tiles[j]:
                     inversion += 1
+        if self.n % 2 == 0:
+            # A vertical move jumps a tile over n - 1 others, an odd number of inversions
+            inversion += list(state).index(0) // self.n
+
+        return inversion % 2
+
+    def check_solvability(self, state):
+        """ Checks if the given state is solvable """
 
-        return inversion % 2 == 0
+        return self.parity(state) == self.parity(self.goal)
+
+    def reverse(self):
+        """ Return the same puzzle with the initial and goal states swapped; every move
+        can be undone, so it solves the puzzle backwards """
+
+        reverse = copy.copy(self)
+        reverse.initial, reverse.goal = self.goal, self.initial
+        return reverse
+
+    def undo(self, state, action):
+        """ Return the move that puts the blank back where it was before action """
+
+        return self.opposite[action]
 
     def h(self, node):
-        """ Return the heuristic value for a given state. Default heuristic function used is 
+        """ Return the heuristic value for a given state. Default heuristic function used is
         h(n) = number of misplaced tiles """
 
         return sum(s != g for (s, g) in zip(node.state, self.goal))
 
 
+class EightPuzzle(NPuzzle):
+    """ The problem of sliding tiles numbered from 1 to 8 on a 3x3 board, where one of the
+    squares is a blank. A state is represented as a tuple of length 9, where  element at
+    index i represents the tile number  at index i (0 if it's an empty square) """
+
+    def __init__(self, initial, goal=(1, 2, 3, 4, 5, 6, 7, 8, 0)):
+        """ Define goal state and initialize a problem """
+        super().__init__(3, initial, goal)
+
+
+class PackedNPuzzle(NPuzzle):
+    """ An NPuzzle whose states are single ints instead of tuples, for boards up to 4x4.
+    Tile at index i is stored in bits 4i..4i+3 and the index of the blank square in the
+    bits above the board, so a move is a few shifts and xors and needs no search for the
+    blank. Use encode and decode to convert between boards and packed states """
+
+    TILE_MASK = 0xF
+
+    def __init__(self, n, initial, goal=None):
+        """ Define goal state and initialize a problem. Boards may be given
+        either as tuples or as packed ints """
+        assert n * n <= 16, 'tiles are packed in 4 bits'
+        if goal is None:
+            goal = tuple(range(1, n * n)) + (0,)
+        self.cells = n * n
+        self.blank_shift = 4 * self.cells
+        super().__init__(n, self.encode(initial), self.encode(goal))
+        self.goal_board = self.decode(self.goal)
+
+    def encode(self, board):
+        """Pack a board given as a sequence of tiles into an int"""
+        if isinstance(board, int):
+            return board
+        state = 0
+        for i, tile in enumerate(board):
+            state |= tile << (4 * i)
+        return state | (list(board).index(0) << self.blank_shift)
+
+    def decode(self, state):
+        """Unpack a packed state into a tuple of tiles"""
+        return tuple((state >> (4 * i)) & self.TILE_MASK for i in range(self.cells))
+
+    def find_blank_square(self, state):
+        """Return the index of the blank square in a given state"""
+
+        return state >> self.blank_shift
+
+    def result(self, state, action):
+        """ Given state and action, return a new state that is the result of the action.
+        Action is assumed to be a valid action in the state """
+
+        blank = state >> self.blank_shift
+        neighbor = self.neighbor[blank][action]
+        tile = (state >> (4 * neighbor)) & self.TILE_MASK
+        # The blank square holds 0, so xor moves the tile into it
+        return (state ^ (tile << (4 * neighbor)) ^ (tile << (4 * blank))
+                ^ ((blank ^ neighbor) << self.blank_shift))
+
+    def reverse(self):
+        """ Return the same puzzle with the initial and goal states swapped """
+
+        reverse = super().reverse()
+        reverse.goal_board = self.decode(reverse.goal)
+        return reverse
+
+    def parity(self, state):
+        """ Return the solvability parity of a packed state or a board """
+
+        if isinstance(state, int):
+            state = self.decode(state)
+        return super().parity(state)
+
+    def h(self, node):
+        """ Return the number of misplaced tiles in the state of node """
+
+        return sum(s != g for (s, g) in zip(self.decode(node.state), self.goal_board))
+
+
+class PackedEightPuzzle(PackedNPuzzle):
+    """ An EightPuzzle with states packed into ints, see PackedNPuzzle """
+
+    def __init__(self, initial, goal=(1, 2, 3, 4, 5, 6, 7, 8, 0)):
+        """ Define goal state and initialize a problem """
+        super().__init__(3, initial, goal)
+
+
+class ManhattanHeuristic:
+    """ Sum of the Manhattan distances of the tiles from their goal squares, for an
+    NPuzzle with states given as tuples. With linear_conflict=True, 2 moves are
+    added for every tile that has to leave its goal row or column to let another tile
+    of the same line pass it, which keeps the heuristic admissible.
+
+    The value is cached on each node together with the position of the blank, under an
+    attribute named after this heuristic object, so heuristics for other goals or
+    variants never read each other's values. A child
+    differs from its parent only in the tile that moved, so its value is computed from
+    the parent's value in O(1) (plus a rescan of the two affected lines for linear
+    conflicts) instead of rescanning the whole board:
+        astar_search(puzzle, ManhattanHeuristic(puzzle)) """
+
+    def __init__(self, problem, linear_conflict=False):
+        self.width = width = exact_sqrt(len(problem.goal))
+        self.linear_conflict = linear_conflict
+        self.slot = '_{}_{}'.format('linear_conflict' if linear_conflict else 'manhattan', id(self))
+        self.delta = {'UP': -width, 'DOWN': width, 'LEFT': -1, 'RIGHT': 1}
+        self.goal_row = [0] * len(problem.goal)
+        self.goal_col = [0] * len(problem.goal)
+        for square, tile in enumerate(problem.goal):
+            self.goal_row[tile], self.goal_col[tile] = divmod(square, width)
+        # distance[tile][square] is the Manhattan distance of tile at square from its goal
+        self.distance = [[0 if tile == 0 else
+                          abs(square // width - self.goal_row[tile]) + abs(square % width - self.goal_col[tile])
+                          for square in range(len(problem.goal))]
+                         for tile in range(len(problem.goal))]
+
+    def __call__(self, node):
+        return self.h(node)
+
+    def h(self, node):
+        """ Return the heuristic value for the state of node """
+
+        cached = getattr(node.parent, self.slot, None) if node.parent is not None else None
+        # The id of a heuristic that no longer exists can be reused by a new one
+        if cached is None or cached[0] is not self:
+            blank = node.state.index(0)
+            value = sum(self.distance[tile][square] for square, tile in enumerate(node.state))
+            if self.linear_conflict:
+                value += 2 * sum(self.line_conflicts(node.state, line, True) +
+                                 self.line_conflicts(node.state, line, False)
+                                 for line in range(self.width))
+        else:
+            # The tile next to the parent's blank moved into it
+            _, parent_value, parent_blank = cached
+            blank = parent_blank + self.delta[node.action]
+            tile = node.state[parent_blank]
+            value = parent_value + self.distance[tile][parent_blank] - self.distance[tile][blank]
+            if self.linear_conflict:
+                # A horizontal move changes two columns, a vertical one two rows
+                is_row = node.action in ('UP', 'DOWN')
+                lines = {blank // self.width, parent_blank // self.width} if is_row else \
+                    {blank % self.width, parent_blank % self.width}
+                for line in lines:
+                    value += 2 * (self.line_conflicts(node.state, line, is_row) -
+                                  self.line_conflicts(node.parent.state, line, is_row))
+        try:
+            setattr(node, self.slot, (self, value, blank))
+        except AttributeError:
+            # A SlottedNode has no room for the cache; its children are computed in full
+            pass
+        return value
+
+    def line_conflicts(self, state, line, is_row):
+        """ Return the number of tiles that must leave the given row (or column) so that
+        the tiles of that line which belong in it are in their goal order """
+
+        width = self.width
+        if is_row:
+            squares = range(line * width, (line + 1) * width)
+            goal_line, goal_order = self.goal_row, self.goal_col
+        else:
+            squares = range(line, width * width, width)
+            goal_line, goal_order = self.goal_col, self.goal_row
+        order = [goal_order[state[square]] for square in squares
+                 if state[square] != 0 and goal_line[state[square]] == line]
+        # Tiles in the longest increasing subsequence can stay, the rest must move out
+        longest = [1] * len(order)
+        for i in range(len(order)):
+            for j in range(i):
+                if order[j] < order[i] and longest[j] + 1 > longest[i]:
+                    longest[i] = longest[j] + 1
+        return len(order) - max(longest, default=0)
+
+
 # ______________________________________________________________________________
 
 
@@ -651,16 +1259,26 @@ class PlanRoute(Problem):
 # Other search algorithms
 
 
-def recursive_best_first_search(problem, h=None):
+def recursive_best_first_search(problem, h=None, stats=None, budget=None):
     """[Figure 3.26]"""
+    stats = (stats or SearchStats()).start()
     h = memoize(h or problem.h, 'h')
 
+    class OutOfBudget(Exception):
+        """Unwinds the recursion with (reason, node) when the budget runs out."""
+
     def RBFS(problem, node, flimit):
         if problem.goal_test(node.state):
             return node, 0  # (The second value is immaterial)
+        if budget is not None:
+            reason = budget.exceeded(stats, node.depth)
+            if reason:
+                raise OutOfBudget(reason, node)
         successors = node.expand(problem)
+        stats.nodes_expanded += 1
+        stats.nodes_generated += len(successors)
         if len(successors) == 0:
-            return None, np.inf
+            return None, math.inf
         for s in successors:
             s.f = max(s.path_cost + h(s), node.f)
         while True:
@@ -672,15 +1290,18 @@ def recursive_best_first_search(problem, h=None):
             if len(successors) > 1:
                 alternative = successors[1].f
             else:
-                alternative = np.inf
+                alternative = math.inf
             result, best.f = RBFS(problem, best, min(flimit, alternative))
             if result is not None:
                 return result, best.f
 
     node = Node(problem.initial)
     node.f = h(node)
-    result, bestf = RBFS(problem, node, np.inf)
-    return result
+    try:
+        result, bestf = RBFS(problem, node, math.inf)
+    except OutOfBudget as out_of_budget:
+        return stats.out_of_budget(*out_of_budget.args)
+    return stats.finish('goal' if result else 'exhausted', result)
 
 
 def hill_climbing(problem):
@@ -703,7 +1324,7 @@ def hill_climbing(problem):
 
 def exp_schedule(k=20, lam=0.005, limit=100):
     """One possible schedule function for simulated annealing"""
-    return lambda t: (k * np.exp(-lam * t) if t < limit else 0)
+    return lambda t: (k * math.exp(-lam * t) if t < limit else 0)
 
 
 def simulated_annealing(problem, schedule=exp_schedule()):
@@ -719,7 +1340,7 @@ def simulated_annealing(problem, schedule=exp_schedule()):
             return current.state
         next_choice = random.choice(neighbors)
         delta_e = problem.value(next_choice.state) - problem.value(current.state)
-        if delta_e > 0 or probability(np.exp(delta_e / T)):
+        if delta_e > 0 or probability(math.exp(delta_e / T)):
             current = next_choice
 
 
@@ -738,7 +1359,7 @@ def simulated_annealing_full(problem, schedule=exp_schedule()):
             return current.state
         next_choice = random.choice(neighbors)
         delta_e = problem.value(next_choice.state) - problem.value(current.state)
-        if delta_e > 0 or probability(np.exp(delta_e / T)):
+        if delta_e > 0 or probability(math.exp(delta_e / T)):
             current = next_choice
 
 
@@ -1094,13 +1715,30 @@ class Graph:
     def get(self, a, b=None):
         """Return a link distance or a dict of {node: distance} entries.
         .get(a,b) returns the distance or None;
-        .get(a) returns a dict of {node: distance} entries, possibly {}."""
-        links = self.graph_dict.setdefault(a, {})
+        .get(a) returns a dict of {node: distance} entries, possibly {}.
+        Reading never adds a to the graph."""
+        links = self.graph_dict.get(a)
+        if links is None:
+            return {} if b is None else None
         if b is None:
             return links
         else:
             return links.get(b)
 
+    def reverse(self):
+        """Return a graph with every link turned around, which is the graph
+        itself if it is undirected. Locations, if any, are shared."""
+        if not self.directed:
+            return self
+        reverse = Graph()
+        for a, links in self.graph_dict.items():
+            reverse.graph_dict.setdefault(a, {})
+            for b, dist in links.items():
+                reverse.connect1(b, a, dist)
+        if hasattr(self, 'locations'):
+            reverse.locations = self.locations
+        return reverse
+
     def nodes(self):
         """Return a list of nodes in the graph."""
         s1 = set([k for k in self.graph_dict.keys()])
@@ -1108,6 +1746,108 @@ class Graph:
         nodes = s1.union(s2)
         return list(nodes)
 
+    def freeze(self):
+        """Return a CompiledGraph with the same nodes, links and locations.
+        Link lengths must be numbers. Later changes to this graph are not
+        seen by the compiled one."""
+        nodes = list(dict.fromkeys(chain(self.graph_dict, *self.graph_dict.values())))
+        index = {node: i for i, node in enumerate(nodes)}
+        offsets, targets, weights = array('q', [0]), array('q'), array('d')
+        for node in nodes:
+            for b, dist in self.graph_dict.get(node, {}).items():
+                targets.append(index[b])
+                weights.append(dist)
+            offsets.append(len(targets))
+        locations = getattr(self, 'locations', None)
+        if locations:
+            x = array('d', (locations[node][0] if node in locations else math.nan for node in nodes))
+            y = array('d', (locations[node][1] if node in locations else math.nan for node in nodes))
+        else:
+            x = y = None
+        return CompiledGraph(nodes, offsets, targets, weights, x, y, index)
+
+
+class CompiledGraph:
+    """A Graph frozen into compressed sparse row arrays, which take a few
+    machine words per link instead of a dict entry, for large road networks.
+    Nodes are numbered 0..n-1: nodes[i] is the original node numbered i and
+    index maps it back. The links out of node i are the edges numbered
+    offsets[i] up to offsets[i + 1]; edge e leads to node targets[e] and has
+    length weights[e]. x and y hold the locations by node id, or are None.
+    Build one with Graph.freeze() and search it with CompiledGraphProblem."""
+
+    def __init__(self, nodes, offsets, targets, weights, x=None, y=None, index=None):
+        self.nodes = nodes
+        self.index = index or {node: i for i, node in enumerate(nodes)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.x, self.y = x, y
+        self.mirror = None
+        self._reverse = None
+
+    @classmethod
+    def from_edges(cls, nodes, sources, targets, weights, x=None, y=None, index=None):
+        """Build a CompiledGraph from parallel arrays of link sources, targets
+        (both node ids) and lengths, in any order, with a counting sort."""
+        n = len(nodes)
+        offsets = array('q', bytes(8 * (n + 1)))
+        for a in sources:
+            offsets[a + 1] += 1
+        for i in range(n):
+            offsets[i + 1] += offsets[i]
+        free = array('q', offsets)
+        sorted_targets, sorted_weights = array('q', bytes(8 * len(targets))), array('d', bytes(8 * len(targets)))
+        for a, b, dist in zip(sources, targets, weights):
+            e = free[a]
+            free[a] += 1
+            sorted_targets[e], sorted_weights[e] = b, dist
+        return cls(nodes, offsets, sorted_targets, sorted_weights, x, y, index)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def edges(self, i):
+        """Return the range of the numbers of the edges out of node i."""
+        return range(self.offsets[i], self.offsets[i + 1])
+
+    def get(self, a, b=None):
+        """Like Graph.get, but with node ids: .get(a, b) returns the length of
+        the link from a to b or None, .get(a) a dict of {node id: length}."""
+        targets, weights = self.targets, self.weights
+        if b is None:
+            return {targets[e]: weights[e] for e in self.edges(a)}
+        for e in self.edges(a):
+            if targets[e] == b:
+                return weights[e]
+        return None
+
+    def reverse(self):
+        """Return the graph with every link turned around, built once by a
+        counting sort of the edges on their targets. mirror[e] then gives,
+        in both graphs, the number of the same link in the other graph."""
+        if self._reverse is None:
+            n, targets = len(self.nodes), self.targets
+            offsets = array('q', bytes(8 * (n + 1)))
+            for t in targets:
+                offsets[t + 1] += 1
+            for i in range(n):
+                offsets[i + 1] += offsets[i]
+            free = array('q', offsets)
+            reverse_targets = array('q', bytes(8 * len(targets)))
+            weights = array('d', bytes(8 * len(targets)))
+            mirror, self.mirror = array('q', bytes(8 * len(targets))), array('q', bytes(8 * len(targets)))
+            for a in range(n):
+                for e in range(self.offsets[a], self.offsets[a + 1]):
+                    r = free[targets[e]]
+                    free[targets[e]] += 1
+                    reverse_targets[r], weights[r] = a, self.weights[e]
+                    mirror[r], self.mirror[e] = e, r
+            reverse = CompiledGraph(self.nodes, offsets, reverse_targets, weights, self.x, self.y, self.index)
+            reverse.mirror, reverse._reverse = mirror, self
+            self._reverse = reverse
+        return self._reverse
+
 
 def UndirectedGraph(graph_dict=None):
     """Build a Graph where every edge (including future ones) goes both ways."""
@@ -1121,110 +1861,179 @@ def RandomGraph(nodes=list(range(10)), min_links=2, width=400, height=300,
     Then each node is connected to the min_links nearest neighbors.
     Because inverse links are added, some nodes will have more connections.
     The distance between nodes is the hypotenuse times curvature(),
-    where curvature() defaults to a random number between 1.1 and 1.5."""
+    where curvature() defaults to a random number between 1.1 and 1.5.
+    Nearest neighbors are found with a grid of buckets: a graph of a hundred
+    thousand nodes takes a few seconds and one of a million about half a minute.
+    Give it a rectangle large enough to hold them."""
     g = UndirectedGraph()
     g.locations = {}
+    nodes = list(nodes)
     # Build the cities
     for node in nodes:
         g.locations[node] = (random.randrange(width), random.randrange(height))
+    points = [g.locations[node] for node in nodes]
+    # Bucket the cities into square cells holding about one city each
+    cell = max(1, int(math.sqrt(width * height / max(len(nodes), 1))))
+    cells = {}
+    for i, (x, y) in enumerate(points):
+        cells.setdefault((x // cell, y // cell), []).append(i)
+    max_ring = max(width, height) // cell + 1
+    # rings[r] lists the cell offsets at distance r
+    rings = [[(dx, dy) for dx in range(-r, r + 1) for dy in (range(-r, r + 1) if abs(dx) == r else (-r, r))]
+             for r in range(min(max_ring, 4) + 1)]
+
+    def nearest(i, links):
+        """The closest city to city i that it has no road to yet, searching the
+        cells around it ring by ring; ties go to the first city in nodes."""
+        x, y = points[i]
+        cx, cy = x // cell, y // cell
+        best, best_j = math.inf, None
+        for r in range(max_ring + 1):
+            if r == len(rings):
+                rings.append([(dx, dy) for dx in range(-r, r + 1)
+                              for dy in (range(-r, r + 1) if abs(dx) == r else (-r, r))])
+            for dx, dy in rings[r]:
+                for j in cells.get((cx + dx, cy + dy), ()):
+                    px, py = points[j]
+                    d = (px - x) ** 2 + (py - y) ** 2
+                    # A road of length 0 counts as none, as it always has here
+                    if (d < best or d == best and j < best_j) and j != i and not links.get(nodes[j]):
+                        best, best_j = d, j
+            # Cities in the next rings are more than r cells away
+            if best < (r * cell + 1) ** 2:
+                return best_j
+        return best_j
+
     # Build roads from each city to at least min_links nearest neighbors.
-    for i in range(min_links):
-        for node in nodes:
-            if len(g.get(node)) < min_links:
-                here = g.locations[node]
+    for _ in range(min_links):
+        for i, node in enumerate(nodes):
+            links = g.get(node)
+            if len(links) < min_links:
+                j = nearest(i, links)
+                if j is None:
+                    continue
+                d = distance(points[j], points[i]) * curvature()
+                g.connect(node, nodes[j], int(d))
+    return g
 
-                def distance_to_node(n):
-                    if n is node or g.get(node, n):
-                        return np.inf
-                    return distance(g.locations[n], here)
 
-                neighbor = min(nodes, key=distance_to_node)
-                d = distance(g.locations[neighbor], here) * curvature()
-                g.connect(node, neighbor, int(d))
-    return g
+# The example graphs below are built the first time they are used, rather than
+# whenever search is imported; read them as search.romania_map and so on.
 
+def _romania_map():
+    """ [Figure 3.2]
+    Simplified road map of Romania
+    """
+    romania_map = UndirectedGraph(dict(
+        Arad=dict(Zerind=75, Sibiu=140, Timisoara=118),
+        Bucharest=dict(Urziceni=85, Pitesti=101, Giurgiu=90, Fagaras=211),
+        Craiova=dict(Drobeta=120, Rimnicu=146, Pitesti=138),
+        Drobeta=dict(Mehadia=75),
+        Eforie=dict(Hirsova=86),
+        Fagaras=dict(Sibiu=99),
+        Hirsova=dict(Urziceni=98),
+        Iasi=dict(Vaslui=92, Neamt=87),
+        Lugoj=dict(Timisoara=111, Mehadia=70),
+        Oradea=dict(Zerind=71, Sibiu=151),
+        Pitesti=dict(Rimnicu=97),
+        Rimnicu=dict(Sibiu=80),
+        Urziceni=dict(Vaslui=142)))
+    romania_map.locations = dict(
+        Arad=(91, 492), Bucharest=(400, 327), Craiova=(253, 288),
+        Drobeta=(165, 299), Eforie=(562, 293), Fagaras=(305, 449),
+        Giurgiu=(375, 270), Hirsova=(534, 350), Iasi=(473, 506),
+        Lugoj=(165, 379), Mehadia=(168, 339), Neamt=(406, 537),
+        Oradea=(131, 571), Pitesti=(320, 368), Rimnicu=(233, 410),
+        Sibiu=(207, 457), Timisoara=(94, 410), Urziceni=(456, 350),
+        Vaslui=(509, 444), Zerind=(108, 531))
+    return romania_map
+
+
+def _vacuum_world():
+    """ [Figure 4.9]
+    Eight possible states of the vacumm world
+    Each state is represented as
+       *       "State of the left room"      "State of the right room"   "Room in which the agent
+                                                                          is present"
+    1 - DDL     Dirty                         Dirty                       Left
+    2 - DDR     Dirty                         Dirty                       Right
+    3 - DCL     Dirty                         Clean                       Left
+    4 - DCR     Dirty                         Clean                       Right
+    5 - CDL     Clean                         Dirty                       Left
+    6 - CDR     Clean                         Dirty                       Right
+    7 - CCL     Clean                         Clean                       Left
+    8 - CCR     Clean                         Clean                       Right
+    """
+    return Graph(dict(
+        State_1=dict(Suck=['State_7', 'State_5'], Right=['State_2']),
+        State_2=dict(Suck=['State_8', 'State_4'], Left=['State_2']),
+        State_3=dict(Suck=['State_7'], Right=['State_4']),
+        State_4=dict(Suck=['State_4', 'State_2'], Left=['State_3']),
+        State_5=dict(Suck=['State_5', 'State_1'], Right=['State_6']),
+        State_6=dict(Suck=['State_8'], Left=['State_5']),
+        State_7=dict(Suck=['State_7', 'State_3'], Right=['State_8']),
+        State_8=dict(Suck=['State_8', 'State_6'], Left=['State_7'])
+    ))
+
+
+def _one_dim_state_space():
+    """ [Figure 4.23]
+    One-dimensional state space Graph
+    """
+    one_dim_state_space = Graph(dict(
+        State_1=dict(Right='State_2'),
+        State_2=dict(Right='State_3', Left='State_1'),
+        State_3=dict(Right='State_4', Left='State_2'),
+        State_4=dict(Right='State_5', Left='State_3'),
+        State_5=dict(Right='State_6', Left='State_4'),
+        State_6=dict(Left='State_5')
+    ))
+    one_dim_state_space.least_costs = dict(
+        State_1=8,
+        State_2=9,
+        State_3=2,
+        State_4=2,
+        State_5=4,
+        State_6=3)
+    return one_dim_state_space
+
+
+def _australia_map():
+    """ [Figure 6.1]
+    Principal states and territories of Australia
+    """
+    australia_map = UndirectedGraph(dict(
+        T=dict(),
+        SA=dict(WA=1, NT=1, Q=1, NSW=1, V=1),
+        NT=dict(WA=1, Q=1),
+        NSW=dict(Q=1, V=1)))
+    australia_map.locations = dict(WA=(120, 24), NT=(135, 20), SA=(135, 30),
+                                   Q=(145, 20), NSW=(145, 32), T=(145, 42),
+                                   V=(145, 37))
+    return australia_map
 
-""" [Figure 3.2]
-Simplified road map of Romania
-"""
-romania_map = UndirectedGraph(dict(
-    Arad=dict(Zerind=75, Sibiu=140, Timisoara=118),
-    Bucharest=dict(Urziceni=85, Pitesti=101, Giurgiu=90, Fagaras=211),
-    Craiova=dict(Drobeta=120, Rimnicu=146, Pitesti=138),
-    Drobeta=dict(Mehadia=75),
-    Eforie=dict(Hirsova=86),
-    Fagaras=dict(Sibiu=99),
-    Hirsova=dict(Urziceni=98),
-    Iasi=dict(Vaslui=92, Neamt=87),
-    Lugoj=dict(Timisoara=111, Mehadia=70),
-    Oradea=dict(Zerind=71, Sibiu=151),
-    Pitesti=dict(Rimnicu=97),
-    Rimnicu=dict(Sibiu=80),
-    Urziceni=dict(Vaslui=142)))
-romania_map.locations = dict(
-    Arad=(91, 492), Bucharest=(400, 327), Craiova=(253, 288),
-    Drobeta=(165, 299), Eforie=(562, 293), Fagaras=(305, 449),
-    Giurgiu=(375, 270), Hirsova=(534, 350), Iasi=(473, 506),
-    Lugoj=(165, 379), Mehadia=(168, 339), Neamt=(406, 537),
-    Oradea=(131, 571), Pitesti=(320, 368), Rimnicu=(233, 410),
-    Sibiu=(207, 457), Timisoara=(94, 410), Urziceni=(456, 350),
-    Vaslui=(509, 444), Zerind=(108, 531))
-
-""" [Figure 4.9]
-Eight possible states of the vacumm world
-Each state is represented as
-   *       "State of the left room"      "State of the right room"   "Room in which the agent
-                                                                      is present"
-1 - DDL     Dirty                         Dirty                       Left
-2 - DDR     Dirty                         Dirty                       Right
-3 - DCL     Dirty                         Clean                       Left
-4 - DCR     Dirty                         Clean                       Right
-5 - CDL     Clean                         Dirty                       Left
-6 - CDR     Clean                         Dirty                       Right
-7 - CCL     Clean                         Clean                       Left
-8 - CCR     Clean                         Clean                       Right
-"""
-vacuum_world = Graph(dict(
-    State_1=dict(Suck=['State_7', 'State_5'], Right=['State_2']),
-    State_2=dict(Suck=['State_8', 'State_4'], Left=['State_2']),
-    State_3=dict(Suck=['State_7'], Right=['State_4']),
-    State_4=dict(Suck=['State_4', 'State_2'], Left=['State_3']),
-    State_5=dict(Suck=['State_5', 'State_1'], Right=['State_6']),
-    State_6=dict(Suck=['State_8'], Left=['State_5']),
-    State_7=dict(Suck=['State_7', 'State_3'], Right=['State_8']),
-    State_8=dict(Suck=['State_8', 'State_6'], Left=['State_7'])
-))
-
-""" [Figure 4.23]
-One-dimensional state space Graph
-"""
-one_dim_state_space = Graph(dict(
-    State_1=dict(Right='State_2'),
-    State_2=dict(Right='State_3', Left='State_1'),
-    State_3=dict(Right='State_4', Left='State_2'),
-    State_4=dict(Right='State_5', Left='State_3'),
-    State_5=dict(Right='State_6', Left='State_4'),
-    State_6=dict(Left='State_5')
-))
-one_dim_state_space.least_costs = dict(
-    State_1=8,
-    State_2=9,
-    State_3=2,
-    State_4=2,
-    State_5=4,
-    State_6=3)
-
-""" [Figure 6.1]
-Principal states and territories of Australia
-"""
-australia_map = UndirectedGraph(dict(
-    T=dict(),
-    SA=dict(WA=1, NT=1, Q=1, NSW=1, V=1),
-    NT=dict(WA=1, Q=1),
-    NSW=dict(Q=1, V=1)))
-australia_map.locations = dict(WA=(120, 24), NT=(135, 20), SA=(135, 30),
-                               Q=(145, 20), NSW=(145, 32), T=(145, 42),
-                               V=(145, 37))
+
+_example_graphs = dict(romania_map=_romania_map, vacuum_world=_vacuum_world,
+                       one_dim_state_space=_one_dim_state_space, australia_map=_australia_map)
+# The graphs built so far, kept out of the module namespace so that a star
+# import exports the same names however many of them have been built
+_built_graphs = {}
+
+
+def example_graph(name):
+    """Return the example graph called name, building it on first use.
+    search.romania_map and the like also return it, but "from search import *"
+    never exports the example graphs."""
+    graph = _built_graphs.get(name)
+    if graph is None:
+        graph = _built_graphs[name] = _example_graphs[name]()
+    return graph
+
+
+def __getattr__(name):
+    if name in _example_graphs:
+        return example_graph(name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__, name))
 
 
 class GraphProblem(Problem):
@@ -1233,6 +2042,7 @@ class GraphProblem(Problem):
     def __init__(self, initial, goal, graph):
         super().__init__(initial, goal)
         self.graph = graph
+        self.h_table = None
 
     def actions(self, A):
         """The actions at a graph node are just its neighbors."""
@@ -1243,27 +2053,289 @@ class GraphProblem(Problem):
         return action
 
     def path_cost(self, cost_so_far, A, action, B):
-        return cost_so_far + (self.graph.get(A, B) or np.inf)
+        return cost_so_far + (self.graph.get(A, B) or math.inf)
+
+    def reverse(self):
+        """The problem of going from goal to initial along reversed links."""
+        return GraphProblem(self.goal, self.initial, self.graph.reverse())
+
+    def undo(self, state, action):
+        """Going back from a neighbor means going to state again."""
+        return state
 
     def find_min_edge(self):
         """Find minimum value of edges."""
-        m = np.inf
+        m = math.inf
         for d in self.graph.graph_dict.values():
-            local_min = min(d.values())
+            local_min = min(d.values(), default=math.inf)
             m = min(m, local_min)
 
         return m
 
     def h(self, node):
-        """h function is straight-line distance from a node's state to goal."""
+        """h function is straight-line distance from a node's state to goal,
+        or the exact cost if a DistanceTable is attached to a graph without
+        locations. The values of all nodes are computed together on the first call."""
         locs = getattr(self.graph, 'locations', None)
-        if locs:
+        distances = getattr(self.graph, 'distances', None)
+        if locs or distances is not None:
+            if self.h_table is None:
+                # Without locations, use the exact costs of a DistanceTable
+                self.h_table = self.straight_line_distances() if locs else distances.to_goal(self.goal)
             if type(node) is str:
-                return int(distance(locs[node], locs[self.goal]))
+                return self.h_table[node]
 
-            return int(distance(locs[node.state], locs[self.goal]))
+            return self.h_table[node.state]
         else:
-            return np.inf
+            return math.inf
+
+    def straight_line_distances(self):
+        """Return a dict of the straight-line distance from every located
+        node to goal, rounded down, computed in one vectorized pass."""
+        import numpy as np
+        locs = self.graph.locations
+        nodes = list(locs)
+        xy = np.array([locs[node] for node in nodes], dtype=float).reshape(-1, 2)
+        goal_x, goal_y = locs[self.goal]
+        distances = np.floor(np.hypot(xy[:, 0] - goal_x, xy[:, 1] - goal_y)).astype(np.int64)
+        return dict(zip(nodes, distances.tolist()))
+
+
+class CompiledGraphProblem(GraphProblem):
+    """The problem of searching a CompiledGraph from one node to another.
+    initial and goal are nodes of the original Graph, but states are node ids
+    and actions are edge numbers, so expanding a node only reads the arrays:
+        problem = CompiledGraphProblem('Arad', 'Bucharest', romania_map.freeze())
+        problem.solution(astar_search(problem))"""
+
+    def __init__(self, initial, goal, graph):
+        super().__init__(graph.index[initial], graph.index[goal], graph)
+
+    def actions(self, A):
+        """The numbers of the edges out of A."""
+        return self.graph.edges(A)
+
+    def result(self, state, action):
+        return self.graph.targets[action]
+
+    def path_cost(self, cost_so_far, A, action, B):
+        return cost_so_far + self.graph.weights[action]
+
+    def find_min_edge(self):
+        return min(self.graph.weights, default=math.inf)
+
+    def h(self, node):
+        """Straight-line distance from a node's state to goal, looked up in
+        a table of all nodes computed on the first call."""
+        if self.graph.x is None:
+            return math.inf
+        if self.h_table is None:
+            self.h_table = self.straight_line_distances()
+        return self.h_table[node.state]
+
+    def straight_line_distances(self):
+        """Return an array of the straight-line distance from every node to
+        goal, rounded down, computed in one vectorized pass. Nodes without a
+        location get 0."""
+        import numpy as np
+        x = np.frombuffer(self.graph.x, dtype=float)
+        y = np.frombuffer(self.graph.y, dtype=float)
+        distances = np.floor(np.hypot(x - x[self.goal], y - y[self.goal]))
+        return array('d', np.nan_to_num(distances, nan=0.0).tobytes())
+
+    def reverse(self):
+        """The problem of going from goal to initial along reversed links."""
+        reverse = copy.copy(self)
+        reverse.initial, reverse.goal, reverse.graph = self.goal, self.initial, self.graph.reverse()
+        reverse.h_table = None
+        return reverse
+
+    def undo(self, state, action):
+        """The same link in the reversed graph."""
+        self.graph.reverse()
+        return self.graph.mirror[action]
+
+    def solution(self, node):
+        """The original nodes that the path to node goes through after the
+        initial one, as Node.solution() gives them for a GraphProblem."""
+        return [self.graph.nodes[n.state] for n in node.path()[1:]]
+
+
+def path_costs(problem, source=None, parents=False):
+    """Dijkstra's algorithm: return the cost of the cheapest path from source
+    (by default problem.initial) to every state it reaches, using the actions,
+    result and path_cost of problem. For a CompiledGraphProblem the costs are
+    an array indexed by node id, holding inf for nodes out of reach; for other
+    problems they are a dict holding only the reachable states.
+    With parents=True, return (costs, parents) instead, where parents maps
+    each reached state to the one before it on its cheapest path: an array
+    holding -1 for the source and unreached nodes, or a dict without source."""
+    if source is None:
+        source = problem.initial
+    if isinstance(problem, CompiledGraphProblem):
+        graph = problem.graph
+        offsets, targets, weights = graph.offsets, graph.targets, graph.weights
+        costs = array('d', [math.inf]) * len(graph)
+        previous = array('q', [-1]) * len(graph)
+        costs[source] = 0.0
+        frontier = [(0.0, source)]
+        while frontier:
+            cost, a = heapq.heappop(frontier)
+            if cost > costs[a]:
+                continue
+            for e in range(offsets[a], offsets[a + 1]):
+                b, c = targets[e], cost + weights[e]
+                if c < costs[b]:
+                    costs[b] = c
+                    previous[b] = a
+                    heapq.heappush(frontier, (c, b))
+        return (costs, previous) if parents else costs
+    costs = {source: 0}
+    previous = {}
+    frontier = [(0, 0, source)]
+    counter = 1
+    while frontier:
+        cost, _, state = heapq.heappop(frontier)
+        if cost > costs[state]:
+            continue
+        for action in problem.actions(state):
+            child = problem.result(state, action)
+            c = problem.path_cost(cost, state, action, child)
+            if c < costs.get(child, math.inf):
+                costs[child] = c
+                previous[child] = state
+                # The counter keeps states, which need not be comparable, out of the comparison
+                heapq.heappush(frontier, (c, counter, child))
+                counter += 1
+    return (costs, previous) if parents else costs
+
+
+class Landmarks:
+    """The ALT heuristic (A*, landmarks and the triangle inequality). The costs
+    of the cheapest paths from and to a few landmark states are computed once
+    with path_costs; then, for any state s, goal and landmark L,
+        cost(s, goal) >= cost(s, L) - cost(goal, L) and
+        cost(s, goal) >= cost(L, goal) - cost(L, s),
+    and the largest of these bounds is an admissible heuristic, usually much
+    tighter than the straight-line distance on road maps. landmarks is either
+    a list of states or how many to choose, see choose. The problem must be able to reverse(); its goal is not used:
+        landmarks = Landmarks(problem)
+        astar_search(problem, landmarks.heuristic(problem.goal))"""
+
+    def __init__(self, problem, landmarks=4):
+        self.compiled = isinstance(problem, CompiledGraphProblem)
+        if isinstance(landmarks, int):
+            self.choose(problem, landmarks)
+        else:
+            self.landmarks = list(landmarks)
+            self.from_landmark = [path_costs(problem, landmark) for landmark in self.landmarks]
+        reverse = problem.reverse()
+        self.to_landmark = [path_costs(reverse, landmark) for landmark in self.landmarks]
+
+    def choose(self, problem, k):
+        """Pick k landmarks by farthest-point selection: the first is the state
+        farthest from problem.initial, each next one the state farthest from
+        the closest landmark picked so far, among those problem.initial reaches."""
+        nearest = path_costs(problem)
+        states = [i for i, cost in enumerate(nearest) if cost < math.inf] if self.compiled else list(nearest)
+        self.landmarks, self.from_landmark = [], []
+        for _ in range(k):
+            landmark = max(states, key=lambda state: nearest[state])
+            if self.landmarks and nearest[landmark] == 0:
+                break
+            costs = path_costs(problem, landmark)
+            get = costs.__getitem__ if self.compiled else lambda state: costs.get(state, math.inf)
+            first = not self.landmarks
+            nearest = {state: get(state) if first else min(nearest[state], get(state)) for state in states}
+            self.landmarks.append(landmark)
+            self.from_landmark.append(costs)
+
+    def bound(self, state, goal):
+        """Return the largest landmark lower bound on the cost from state to goal."""
+        best = 0
+        for from_landmark, to_landmark in zip(self.from_landmark, self.to_landmark):
+            if self.compiled:
+                bounds = (to_landmark[state] - to_landmark[goal], from_landmark[goal] - from_landmark[state])
+            else:
+                bounds = (to_landmark.get(state, math.inf) - to_landmark.get(goal, math.inf),
+                          from_landmark.get(goal, math.inf) - from_landmark.get(state, math.inf))
+            for value in bounds:
+                # inf - inf is nan, which never compares greater
+                if value > best:
+                    best = value
+        return best
+
+    def heuristic(self, goal):
+        """Return h(node) for searches toward goal. For a CompiledGraphProblem
+        the bounds of all nodes are computed at once with numpy and h is a
+        lookup in that table."""
+        if not self.compiled:
+            return lambda node: self.bound(node.state, goal)
+        import numpy as np
+        table = np.zeros(len(self.from_landmark[0]) if self.landmarks else 0)
+        with np.errstate(invalid='ignore'):
+            for from_landmark, to_landmark in zip(self.from_landmark, self.to_landmark):
+                to_costs = np.frombuffer(to_landmark, dtype=float)
+                from_costs = np.frombuffer(from_landmark, dtype=float)
+                table = np.fmax(table, to_costs - to_costs[goal])
+                table = np.fmax(table, from_costs[goal] - from_costs)
+        table = array('d', table.tobytes())
+        return lambda node: table[node.state]
+
+
+def graph_links(graph):
+    """Yield (a, b, cost) for every link of graph. A link whose value is a
+    number is a length, as for GraphProblem; otherwise, as in the action graphs
+    of online search (vacuum_world, one_dim_state_space), the key is an action
+    and the value the state or list of states it leads to, at cost 1 as in
+    OnlineSearchProblem.c."""
+    for a, links in graph.graph_dict.items():
+        for key, value in links.items():
+            if isinstance(value, (int, float)):
+                yield a, key, value
+            else:
+                for b in (value if isinstance(value, list) else [value]):
+                    yield a, b, 1
+
+
+class DistanceTable:
+    """The exact cost of the cheapest path between every pair of nodes of a
+    small or medium graph, from one Floyd-Warshall pass vectorized over numpy
+    rows: O(n^3) time, n^2 floats. attach stores it on the graph, where it is
+    a perfect heuristic for GraphProblem.h when there are no locations, and
+    the least_costs that OnlineSearchProblem.h reads:
+        DistanceTable(one_dim_state_space).attach(one_dim_state_space, 'State_5')"""
+
+    def __init__(self, graph):
+        import numpy as np
+        links = list(graph_links(graph))
+        self.nodes = list(dict.fromkeys(chain(graph.graph_dict, (b for _, b, _ in links))))
+        self.index = {node: i for i, node in enumerate(self.nodes)}
+        n = len(self.nodes)
+        costs = np.full((n, n), math.inf)
+        np.fill_diagonal(costs, 0)
+        for a, b, cost in links:
+            i, j = self.index[a], self.index[b]
+            costs[i, j] = min(costs[i, j], cost)
+        for k in range(n):
+            np.minimum(costs, costs[:, k, None] + costs[None, k, :], out=costs)
+        self.costs = costs
+
+    def cost(self, a, b):
+        """Return the cost of the cheapest path from a to b, inf if there is none."""
+        return float(self.costs[self.index[a], self.index[b]])
+
+    def to_goal(self, goal):
+        """Return a dict of the cost from every node to goal."""
+        return dict(zip(self.nodes, self.costs[:, self.index[goal]].tolist()))
+
+    def attach(self, graph, goal=None):
+        """Store the table on graph as graph.distances and, if goal is given,
+        the costs to goal as graph.least_costs."""
+        graph.distances = self
+        if goal is not None:
+            graph.least_costs = self.to_goal(goal)
+        return graph
 
 
 class GraphProblemStochastic(GraphProblem):
@@ -1423,7 +2495,7 @@ def boggle_neighbors(n2, cache={}):
 
 def exact_sqrt(n2):
     """If n2 is a perfect square, return its square root, else raise error."""
-    n = int(np.sqrt(n2))
+    n = math.isqrt(n2)
     assert n * n == n2
     return n
 
@@ -1620,6 +2692,7 @@ def compare_searchers(problems, header,
 
 def compare_graph_searchers():
     """Prints a table of search results."""
+    romania_map, australia_map = example_graph('romania_map'), example_graph('australia_map')
     compare_searchers(problems=[GraphProblem('Arad', 'Bucharest', romania_map),
                                 GraphProblem('Oradea', 'Neamt', romania_map),
                                 GraphProblem('Q', 'WA', australia_map)],
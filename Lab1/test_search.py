@@ -0,0 +1,622 @@
+import os
+import threading
+
+import pytest
+
+from search import *
+
+romania_map = example_graph('romania_map')
+one_dim_state_space = example_graph('one_dim_state_space')
+vacuum_world = example_graph('vacuum_world')
+romania_problem = GraphProblem('Arad', 'Bucharest', romania_map)
+eight_puzzle = EightPuzzle((1, 2, 3, 4, 0, 6, 7, 5, 8))
+
+
+def test_indexed_priority_queue():
+    queue = IndexedPriorityQueue('min', lambda x: x[1])
+    queue.extend([('a', 3), ('b', 1), ('c', 2)])
+    assert len(queue) == 3
+    assert ('b', 1) in queue
+    assert queue[('c', 2)] == 2
+    del queue[('b', 1)]
+    assert ('b', 1) not in queue
+    assert len(queue) == 2
+    assert queue.pop() == ('c', 2)
+    assert queue.pop() == ('a', 3)
+    with pytest.raises(KeyError):
+        del queue[('a', 3)]
+
+
+def test_indexed_priority_queue_decrease_key():
+    queue = IndexedPriorityQueue('min', lambda node: node.path_cost)
+    queue.append(Node('A', path_cost=10))
+    queue.append(Node('B', path_cost=5))
+    queue.append(Node('A', path_cost=1))
+    assert len(queue) == 2
+    assert queue[Node('A')] == 1
+    assert queue.pop().path_cost == 1
+    assert queue.pop().state == 'B'
+
+
+def test_uniform_cost_search():
+    assert uniform_cost_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+
+
+def test_astar_search():
+    assert astar_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert astar_search(eight_puzzle).solution() == ['DOWN', 'RIGHT']
+
+
+def test_breadth_first_graph_search():
+    assert breadth_first_graph_search(romania_problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    assert breadth_first_graph_search(eight_puzzle).solution() == ['DOWN', 'RIGHT']
+
+
+def test_depth_first_graph_search():
+    solution = depth_first_graph_search(romania_problem).solution()
+    assert solution[-1] == 'Bucharest'
+    assert depth_first_graph_search(EightPuzzle((1, 2, 3, 4, 5, 6, 7, 8, 0))).solution() == []
+
+
+def test_packed_eight_puzzle():
+    puzzle = PackedEightPuzzle((1, 2, 3, 4, 0, 6, 7, 5, 8))
+    assert puzzle.decode(puzzle.initial) == (1, 2, 3, 4, 0, 6, 7, 5, 8)
+    assert puzzle.find_blank_square(puzzle.initial) == 4
+    assert set(puzzle.actions(puzzle.initial)) == {'UP', 'DOWN', 'LEFT', 'RIGHT'}
+    assert puzzle.decode(puzzle.result(puzzle.initial, 'DOWN')) == (1, 2, 3, 4, 5, 6, 7, 0, 8)
+    assert puzzle.check_solvability(puzzle.initial)
+    assert breadth_first_graph_search(puzzle).solution() == ['DOWN', 'RIGHT']
+    assert astar_search(puzzle).solution() == ['DOWN', 'RIGHT']
+
+
+def test_pattern_database(tmp_path):
+    import pattern_db
+    from pattern_db import PatternDatabase
+    filename = str(tmp_path / 'eight_puzzle.pdb')
+    built = PatternDatabase(filename=filename)
+    loaded = PatternDatabase(filename=filename)
+    puzzle = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    node = Node(puzzle.initial)
+    assert built.h(node) == loaded.h(node)
+    assert loaded.h(Node(puzzle.goal)) == 0
+    assert loaded.h(node) <= 31
+    assert len(astar_search(puzzle, loaded.h).solution()) == 31
+
+    # A damaged or truncated file is rebuilt and replaced
+    size = os.path.getsize(filename)
+    for damaged in (b'', b'not a pattern database', open(filename, 'rb').read()[:size // 2]):
+        with open(filename, 'wb') as file:
+            file.write(damaged)
+        assert PatternDatabase(filename=filename).h(node) == built.h(node)
+        assert os.path.getsize(filename) == size
+    # Without a writable cache directory the tables are kept in memory
+    blocked = tmp_path / 'not_a_directory'
+    blocked.write_text('')
+    assert PatternDatabase(filename=str(blocked / 'eight_puzzle.pdb')).h(node) == built.h(node)
+    # The default file lives in the cache directory, not next to the source
+    assert os.path.dirname(pattern_db.DEFAULT_FILE) != os.path.dirname(os.path.abspath(pattern_db.__file__))
+
+
+def test_manhattan_heuristic():
+    puzzle = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    manhattan = ManhattanHeuristic(puzzle)
+    conflicts = ManhattanHeuristic(puzzle, linear_conflict=True)
+    assert manhattan(Node(puzzle.goal)) == conflicts(Node(puzzle.goal)) == 0
+    assert manhattan(Node((1, 2, 3, 4, 5, 6, 0, 7, 8))) == 2
+    assert conflicts(Node((2, 1, 3, 4, 5, 6, 7, 8, 0))) == 4
+
+    random.seed('aima-python')
+    node = Node(puzzle.initial)
+    for _ in range(200):
+        node = random.choice(node.expand(puzzle))
+        assert manhattan(node) == manhattan(Node(node.state))
+        assert conflicts(node) == conflicts(Node(node.state))
+
+    assert len(astar_search(puzzle, manhattan).solution()) == 31
+    assert len(astar_search(puzzle, conflicts).solution()) == 31
+
+    # Two heuristics for different goals scoring the same nodes keep their own values
+    other_goal = (0, 1, 2, 3, 4, 5, 6, 7, 8)
+    other = ManhattanHeuristic(EightPuzzle(puzzle.initial, other_goal))
+    node = Node(puzzle.initial)
+    assert manhattan(node) == 21 and other(node) == 19
+    child = node.expand(puzzle)[0]
+    assert other(child) == ManhattanHeuristic(EightPuzzle(puzzle.initial, other_goal))(Node(child.state))
+    assert manhattan(child) == ManhattanHeuristic(puzzle)(Node(child.state))
+
+
+def test_ida_star_search():
+    assert ida_star_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert ida_star_search(eight_puzzle).solution() == ['DOWN', 'RIGHT']
+    puzzle = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    assert len(ida_star_search(puzzle, ManhattanHeuristic(puzzle, linear_conflict=True)).solution()) == 31
+
+
+def test_n_puzzle():
+    puzzle = NPuzzle(4, (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 0, 15))
+    assert puzzle.goal == tuple(range(1, 16)) + (0,)
+    assert set(puzzle.actions(puzzle.initial)) == {'UP', 'LEFT', 'RIGHT'}
+    assert puzzle.result(puzzle.initial, 'RIGHT') == puzzle.goal
+    assert puzzle.check_solvability(puzzle.initial)
+    # Swapping two tiles, or moving the blank up a row without a tile, is unsolvable on even widths
+    assert not puzzle.check_solvability((2, 1, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 0))
+    assert not puzzle.check_solvability((1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 0, 12, 13, 14, 15))
+    assert puzzle.check_solvability((1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 0, 13, 14, 15, 12))
+    assert not NPuzzle(3, (1, 2, 3, 4, 5, 6, 8, 7, 0)).check_solvability((1, 2, 3, 4, 5, 6, 8, 7, 0))
+
+    puzzle = NPuzzle(4, (5, 1, 2, 4, 9, 6, 3, 8, 13, 10, 7, 11, 0, 14, 15, 12))
+    assert puzzle.check_solvability(puzzle.initial)
+    solution = ida_star_search(puzzle, ManhattanHeuristic(puzzle, linear_conflict=True)).solution()
+    assert len(solution) == len(astar_search(PackedNPuzzle(4, puzzle.initial)).solution())
+
+
+def test_depth_limited_search():
+    assert depth_limited_search(romania_problem, 3).solution()[-1] == 'Bucharest'
+    assert depth_limited_search(romania_problem, 1) == 'cutoff'
+    assert depth_limited_search(GraphProblem('Arad', 'Bucharest', Graph({'Arad': {}}))) is None
+
+    stats = SearchStats()
+    depth_limited_search(eight_puzzle, 1, stats)
+    assert stats.nodes_generated == 4 and stats.nodes_expanded == 1
+    # Each call gets its own counters
+    assert SearchStats().nodes_generated == 0
+
+    # Cycle checking stops the search from walking back and forth on a path
+    line = UndirectedGraph({i: {i + 1: 1} for i in range(3000)})
+    assert depth_limited_search(GraphProblem(0, -1, line), 3001, check_cycles=True) is None
+    assert depth_limited_search(GraphProblem(0, 3000, line), 3001, check_cycles=True).depth == 3000
+
+
+def test_iterative_deepening_search():
+    assert iterative_deepening_search(romania_problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    stats = SearchStats()
+    assert iterative_deepening_search(eight_puzzle, check_cycles=True, stats=stats).solution() == ['DOWN', 'RIGHT']
+    # stats and budget come in the same positions as in the other searchers
+    puzzle = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    assert iterative_deepening_search(puzzle, SearchStats(), Budget(max_expansions=5)).reason == 'expansions'
+    assert depth_limited_search(puzzle, 20, SearchStats(), Budget(max_expansions=5)).reason == 'expansions'
+    assert stats.nodes_generated > 0
+
+
+def test_search_stats():
+    stats = SearchStats()
+    assert astar_search(eight_puzzle, stats=stats).solution() == ['DOWN', 'RIGHT']
+    assert stats.reason == 'goal'
+    assert stats.nodes_expanded == 2
+    assert stats.nodes_generated >= stats.nodes_expanded
+    assert stats.max_frontier > 0
+    assert stats.elapsed > 0
+
+    stats = SearchStats()
+    unreachable = GraphProblem('Arad', 'Nowhere', romania_map)
+    assert breadth_first_graph_search(unreachable, stats=stats) is None
+    assert stats.reason == 'exhausted'
+    assert stats.nodes_expanded == len(romania_map.nodes())
+
+
+def test_budget():
+    puzzle = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    searches = [breadth_first_tree_search, depth_first_tree_search, depth_first_graph_search,
+                breadth_first_graph_search, uniform_cost_search, iterative_deepening_search,
+                astar_search, ida_star_search, recursive_best_first_search,
+                lambda problem, stats, budget: depth_limited_search(problem, 40, stats, budget=budget)]
+    for search in searches:
+        stats = SearchStats()
+        result = search(puzzle, stats=stats, budget=Budget(max_expansions=50))
+        assert isinstance(result, BudgetExceeded)
+        assert not result
+        assert result.reason == stats.reason == 'expansions'
+        assert isinstance(result.node, Node)
+        assert stats.nodes_expanded <= 50
+
+    # A breadth-first search stops at the node it would have expanded next
+    for search in (breadth_first_tree_search, breadth_first_graph_search):
+        result = search(romania_problem, budget=Budget(max_expansions=1))
+        assert result.node.state == 'Zerind' and result.node.parent.state == 'Arad'
+
+    result = breadth_first_graph_search(puzzle, budget=Budget(max_states=1000))
+    assert result.reason == 'states' and result.stats.nodes_expanded < 1000
+    result = astar_search(puzzle, budget=Budget(max_seconds=0))
+    assert result.reason == 'time'
+    assert astar_search(eight_puzzle, budget=Budget(max_expansions=50)).solution() == ['DOWN', 'RIGHT']
+
+    cancel = threading.Event()
+    cancel.set()
+    assert astar_search(puzzle, budget=Budget(cancel=cancel)).reason == 'cancelled'
+
+
+def test_slotted_node():
+    node = SlottedNode('Arad')
+    assert not hasattr(node, '__dict__')
+    with pytest.raises(AttributeError):
+        node.extra = 1
+    assert astar_search(romania_problem, node_class=SlottedNode).solution() == \
+        ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    result = astar_search(eight_puzzle, ManhattanHeuristic(eight_puzzle), node_class=SlottedNode)
+    assert result.solution() == ['DOWN', 'RIGHT']
+    assert result.f == result.path_cost == 2
+
+
+def test_compact_node_class():
+    CompactNode = compact_node_class(('UP', 'DOWN', 'LEFT', 'RIGHT'))
+    result = astar_search(eight_puzzle, node_class=CompactNode)
+    assert isinstance(result, SlottedNode)
+    assert result.action == 3
+    assert result.solution() == ['DOWN', 'RIGHT']
+
+
+def test_node_arena():
+    arena = NodeArena()
+    root = arena.add('Arad')
+    child = arena.add('Sibiu', root, 'Sibiu', 140)
+    node = arena.node(arena.add('Fagaras', child, 'Fagaras', 239))
+    assert len(arena) == 3
+    assert node.solution() == ['Sibiu', 'Fagaras']
+    assert node.path_cost == 239 and node.parent.path_cost == 140
+
+
+def test_arena_searches():
+    assert arena_breadth_first_graph_search(romania_problem).solution() == ['Sibiu', 'Fagaras', 'Bucharest']
+    assert arena_astar_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert arena_best_first_graph_search(romania_problem, lambda state, g: g).path_cost == 418
+    assert arena_breadth_first_graph_search(eight_puzzle).solution() == ['DOWN', 'RIGHT']
+    stats = SearchStats()
+    assert arena_astar_search(eight_puzzle, stats=stats).solution() == ['DOWN', 'RIGHT']
+    assert stats.reason == 'goal' and stats.nodes_expanded == 2
+    assert arena_astar_search(EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1)),
+                              budget=Budget(max_expansions=10)).reason == 'expansions'
+    # Out of budget, the searches stop at the next node to expand, and count
+    # explored states as well as the frontier against max_states
+    result = arena_breadth_first_graph_search(romania_problem, budget=Budget(max_expansions=1))
+    assert result.node.state == 'Zerind' and result.node.parent.state == 'Arad'
+    result = arena_astar_search(EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1)), budget=Budget(max_states=200))
+    assert result.reason == 'states' and result.stats.nodes_expanded < 200
+
+
+def test_portfolio():
+    from main import portfolio, run_algorithm
+    state = (8, 6, 7, 2, 5, 4, 3, 0, 1)
+    algorithm, solution, stats = portfolio(state, ('h4', 'h5', 'h2'))
+    assert algorithm in ('h4', 'h5')
+    assert len(solution) == 31
+    assert stats.reason == 'goal'
+    # With a single worker the informed search runs before the uninformed ones
+    algorithm, solution, stats = portfolio(state, ('BFS', 'IDS', 'h5'), max_workers=1)
+    assert algorithm == 'h5' and len(solution) == 31
+    with pytest.raises(ValueError):
+        run_algorithm('unknown', EightPuzzle(state))
+
+
+def test_batch():
+    from main import batch
+    items = [('a', None, (1, 2, 3, 4, 0, 6, 7, 5, 8)), ('b', None, (1, 2, 3, 4, 5, 6, 8, 7, 0)),
+             ('c', None, (8, 6, 7, 2, 5, 4, 3, 0, 1))]
+    records = list(batch(items, 'h5', max_workers=2))
+    assert [record['path'] for record in records] == ['a', 'b', 'c']
+    assert [record['length'] for record in records] == [2, None, 31]
+    assert records[1]['reason'] == 'unsolvable'
+    assert records[2]['nodes'] > 0
+    # A bad line of standard input gives an error record, and the lines around it are still solved
+    items = [('<stdin>:1', None, '1 2 3 4 0 6 7 5 8\n'), ('<stdin>:2', None, '1 2 x\n'),
+             ('<stdin>:3', None, '1 2 3 4 5 6 7 0 8\n')]
+    records = list(batch(iter(items), 'h5', max_workers=2, window=1))
+    assert [record['length'] for record in records] == [2, None, 1]
+    assert 'error' in records[1]
+
+
+def test_read_states():
+    from main import read_states
+    lines = ['8 6 7\n', '2 5 4\n', '3 _ 1\n', '1 2 3 4 0 6 7 5 8\n', '\n', '\n',
+             '1 2 3 4\n', '5 6 7 8\n', '9 10 11 12\n', '13 14 0 15\n', '1 0 2 3']
+    assert list(read_states(lines)) == [[8, 6, 7, 2, 5, 4, 3, 0, 1], [1, 2, 3, 4, 0, 6, 7, 5, 8],
+                                        [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 0, 15], [1, 0, 2, 3]]
+    with pytest.raises(ValueError):
+        list(read_states(['1 2 3\n', '4 5 6\n', '\n']))
+
+
+def test_startup_imports():
+    # Short-lived solver processes pay for every import, so keep heavy modules out of start-up
+    import os
+    import subprocess
+    import sys
+    code = ('import sys, time\n'
+            'start = time.perf_counter()\n'
+            'import main, search\n'
+            'print(time.perf_counter() - start)\n'
+            'print(*sorted(name for name in ("numpy", "pandas", "multiprocessing", "concurrent.futures")'
+            ' if name in sys.modules))\n'
+            'print("romania_map" in vars(search))\n'
+            'from search import *\n'
+            'print(*sorted(name for name in search._example_graphs if name in vars(search)))\n'
+            'search.romania_map\n'
+            'from search import *\n'
+            'print("romania_map" in vars(search), "romania_map" in globals())\n')
+    output = subprocess.run([sys.executable, '-c', code], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout.split('\n')
+    assert float(output[0]) < 0.5
+    assert output[1] == ''
+    assert output[2] == 'False'
+    # A star import builds none of the example graphs
+    assert output[3] == ''
+    # and exports none of them either, even once one has been built
+    assert output[4] == 'False False'
+
+
+def test_bidirectional_search():
+    assert bidirectional_search(romania_problem).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert bidirectional_search(romania_problem).path_cost == 418
+    assert bidirectional_search(GraphProblem('Arad', 'Arad', romania_map)).solution() == []
+
+    # Links of a directed graph are followed backwards from the goal
+    one_way = Graph({'A': {'B': 1, 'C': 5}, 'B': {'D': 1}, 'C': {'D': 1}, 'D': {}})
+    assert bidirectional_search(GraphProblem('A', 'D', one_way)).solution() == ['B', 'D']
+    assert bidirectional_search(GraphProblem('D', 'A', one_way)) is None
+
+    assert bidirectional_search(eight_puzzle).solution() == ['DOWN', 'RIGHT']
+    puzzle = EightPuzzle((8, 6, 7, 2, 5, 4, 3, 0, 1))
+    stats = SearchStats()
+    result = bidirectional_search(puzzle, ManhattanHeuristic(puzzle), ManhattanHeuristic(puzzle.reverse()),
+                                  epsilon=1, stats=stats)
+    assert len(result.solution()) == 31
+    assert result.path()[0].state == puzzle.initial and result.state == puzzle.goal
+    assert stats.reason == 'goal'
+    packed = PackedEightPuzzle(puzzle.initial)
+    assert packed.decode(bidirectional_search(packed, epsilon=1).state) == puzzle.goal
+    assert bidirectional_search(puzzle, budget=Budget(max_expansions=10)).reason == 'expansions'
+
+
+def test_compiled_graph():
+    graph = Graph({'A': {'B': 1, 'C': 5}, 'B': {'D': 1}, 'C': {'D': 1}})
+    assert graph.get('Z') == {} and graph.get('Z', 'A') is None
+    assert 'Z' not in graph.graph_dict
+
+    compiled = graph.freeze()
+    a, d = compiled.index['A'], compiled.index['D']
+    assert len(compiled) == 4
+    assert compiled.get(a) == {compiled.index['B']: 1, compiled.index['C']: 5}
+    assert compiled.get(a, d) is None and compiled.get(d) == {}
+    reverse = compiled.reverse()
+    assert reverse.get(d) == {compiled.index['B']: 1, compiled.index['C']: 1}
+    for e in range(len(compiled.targets)):
+        assert reverse.mirror[compiled.mirror[e]] == e
+
+    problem = CompiledGraphProblem('Arad', 'Bucharest', romania_map.freeze())
+    for search in (astar_search, uniform_cost_search, bidirectional_search, arena_astar_search):
+        result = search(problem)
+        assert problem.solution(result) == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+        assert result.path_cost == 418
+    assert problem.solution(breadth_first_graph_search(problem)) == ['Sibiu', 'Fagaras', 'Bucharest']
+    problem = CompiledGraphProblem('A', 'D', compiled)
+    assert problem.solution(bidirectional_search(problem)) == ['B', 'D']
+
+
+def test_graph_io(tmp_path):
+    from graph_io import load_compiled_graph, read_edge_list, save_compiled_graph
+    edges = ['source,target,length\n', 'Arad,Sibiu,140\n', 'Sibiu,Fagaras,99\n', '# a comment\n',
+             'Fagaras,Bucharest,211\n', 'Sibiu,Rimnicu,80\n', 'Rimnicu,Pitesti,97\n', 'Pitesti,Bucharest,101\n']
+    locations = ['name,x,y\n', 'Arad,91,492\n', 'Bucharest,400,327\n', 'Fagaras,305,449\n',
+                 'Pitesti,320,368\n', 'Rimnicu,233,410\n', 'Sibiu,207,457\n']
+    graph = read_edge_list(edges, locations, directed=False, delimiter=',', header=True)
+    assert len(graph) == 6 and len(graph.targets) == 12
+    problem = CompiledGraphProblem('Arad', 'Bucharest', graph)
+    assert problem.h(Node(problem.initial)) == 350
+    assert problem.solution(astar_search(problem)) == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+
+    filename = str(tmp_path / 'romania.csr')
+    save_compiled_graph(filename, graph)
+    loaded = load_compiled_graph(filename)
+    assert loaded.nodes == graph.nodes
+    assert list(loaded.offsets) == list(graph.offsets) and list(loaded.weights) == list(graph.weights)
+    problem = CompiledGraphProblem('Bucharest', 'Arad', loaded)
+    assert problem.solution(bidirectional_search(problem)) == ['Pitesti', 'Rimnicu', 'Sibiu', 'Arad']
+
+    # Node names keep their types, and may hold any character
+    random.seed(7)
+    numbered = RandomGraph(list(range(30)), 2, 200, 200).freeze()
+    save_compiled_graph(filename, numbered)
+    loaded = load_compiled_graph(filename)
+    assert loaded.nodes == numbered.nodes and sorted(loaded.nodes) == list(range(30))
+    assert loaded.index[0] == numbered.index[0]
+    problem = CompiledGraphProblem(0, 29, loaded)
+    assert problem.solution(astar_search(problem)) == \
+        CompiledGraphProblem(0, 29, numbered).solution(astar_search(CompiledGraphProblem(0, 29, numbered)))
+    odd = Graph({'a\nb': {1: 1, 2.5: 2}, 1: {}, 2.5: {}}).freeze()
+    save_compiled_graph(filename, odd)
+    assert load_compiled_graph(filename).nodes == odd.nodes
+    with pytest.raises(TypeError):
+        save_compiled_graph(filename, Graph({(0, 0): {(0, 1): 1}}).freeze())
+
+    directed = read_edge_list(['1 2\n', '2 3 2.5\n'])
+    assert directed.get(directed.index['2']) == {directed.index['3']: 2.5}
+    assert directed.get(directed.index['3']) == {} and directed.x is None
+    # An unweighted header is only skipped when asked, never guessed
+    assert len(read_edge_list(['source,target\n', 'a,b\n'], delimiter=',', header=True)) == 2
+    assert len(read_edge_list(['source,target\n', 'a,b\n'], delimiter=',')) == 4
+
+
+def test_straight_line_table():
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    assert problem.h(Node('Arad')) == problem.h('Arad') == 350
+    assert problem.h(Node('Bucharest')) == 0
+    assert len(problem.h_table) == len(romania_map.locations)
+    compiled = CompiledGraphProblem('Arad', 'Bucharest', romania_map.freeze())
+    assert compiled.h(Node(compiled.initial)) == 350
+    assert compiled.reverse().h(Node(compiled.goal)) == 350
+
+
+def test_landmarks():
+    problem = GraphProblem('Arad', 'Bucharest', romania_map)
+    costs = path_costs(problem)
+    assert costs['Bucharest'] == 418 and len(costs) == 20
+    landmarks = Landmarks(problem, 3)
+    assert len(landmarks.landmarks) == 3
+    h = landmarks.heuristic('Bucharest')
+    # Admissible: never above the true cost to the goal
+    to_goal = path_costs(problem.reverse())
+    assert all(h(Node(city)) <= to_goal[city] for city in romania_map.locations)
+    stats = SearchStats()
+    assert astar_search(problem, h, stats=stats).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+
+    compiled = CompiledGraphProblem('Arad', 'Bucharest', romania_map.freeze())
+    assert path_costs(compiled)[compiled.goal] == 418
+    landmarks = Landmarks(compiled, [compiled.graph.index['Neamt'], compiled.graph.index['Timisoara']])
+    h = landmarks.heuristic(compiled.goal)
+    assert h(Node(compiled.initial)) == landmarks.bound(compiled.initial, compiled.goal) <= 418
+    assert compiled.solution(astar_search(compiled, h)) == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+
+
+def test_route_service():
+    from routing import RouteService
+    service = RouteService(romania_map)
+    cities = sorted(romania_map.locations)
+    for _ in range(2):
+        for initial in cities:
+            for goal in ('Bucharest', 'Arad', initial):
+                cost, path = service.route(initial, goal)
+                assert cost == path_costs(GraphProblem(initial, goal, romania_map))[goal]
+                assert path[0] == initial and path[-1] == goal
+                assert sum(romania_map.get(a, b) for a, b in zip(path, path[1:])) == cost
+    assert service.route('Arad', 'Bucharest') == (418, ['Arad', 'Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest'])
+    assert service.hits > len(cities) and service.tree_hits > 0
+    assert len(service.answers) <= service.answers.maxsize and len(service.trees) <= service.trees.maxsize
+
+    one_way = Graph({'A': {'B': 1}, 'B': {'C': 1}})
+    service = RouteService(one_way, landmarks=1, answers=2)
+    assert service.route('A', 'C') == (2, ['A', 'B', 'C'])
+    assert service.route('C', 'A') == (math.inf, None)
+    assert service.route('B', 'C') == (1, ['B', 'C'])
+    assert len(service.answers) == 2
+
+
+def test_contraction_hierarchy(tmp_path):
+    from contraction import (build_contraction_hierarchy, contraction_hierarchy_search,
+                             load_contraction_hierarchy, save_contraction_hierarchy)
+    hierarchy = build_contraction_hierarchy(romania_map)
+    cities = sorted(romania_map.locations)
+    for initial in cities:
+        costs = path_costs(GraphProblem(initial, None, romania_map))
+        for goal in cities:
+            node = contraction_hierarchy_search(GraphProblem(initial, goal, romania_map), hierarchy)
+            assert node.path_cost == costs[goal]
+            assert node.path()[0].state == initial and node.state == goal
+    stats = SearchStats()
+    result = contraction_hierarchy_search(romania_problem, hierarchy, stats)
+    assert result.solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert stats.reason == 'goal' and stats.nodes_expanded < len(cities)
+
+    filename = str(tmp_path / 'romania.ch')
+    save_contraction_hierarchy(filename, hierarchy)
+    loaded = load_contraction_hierarchy(filename)
+    compiled = CompiledGraphProblem('Arad', 'Bucharest', romania_map.freeze())
+    assert compiled.solution(contraction_hierarchy_search(compiled, loaded)) == \
+        ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+
+    # A graph with int nodes goes through save, load and search unchanged
+    random.seed(7)
+    numbered = RandomGraph(list(range(40)), 2, 300, 300)
+    save_contraction_hierarchy(filename, build_contraction_hierarchy(numbered))
+    loaded = load_contraction_hierarchy(filename)
+    costs = path_costs(GraphProblem(0, None, numbered))
+    for goal in costs:
+        node = contraction_hierarchy_search(GraphProblem(0, goal, numbered), loaded)
+        assert node.path_cost == costs[goal] and node.state == goal
+
+    one_way = Graph({'A': {'B': 1, 'C': 5}, 'B': {'D': 1}, 'C': {'D': 1}, 'D': {'A': 10}})
+    hierarchy = build_contraction_hierarchy(one_way)
+    assert contraction_hierarchy_search(GraphProblem('A', 'D', one_way), hierarchy).solution() == ['B', 'D']
+    assert contraction_hierarchy_search(GraphProblem('C', 'B', one_way), hierarchy).path_cost == 12
+    assert contraction_hierarchy_search(GraphProblem('A', 'E', Graph({'A': {'B': 1}, 'E': {}})),
+                                        build_contraction_hierarchy(Graph({'A': {'B': 1}, 'E': {}}))) is None
+
+
+def test_distance_table():
+    table = DistanceTable(romania_map)
+    assert table.cost('Arad', 'Bucharest') == 418
+    assert table.to_goal('Bucharest') == path_costs(GraphProblem('Bucharest', None, romania_map))
+
+    # A graph without locations gets a perfect heuristic
+    graph = Graph(dict(romania_map.graph_dict))
+    problem = GraphProblem('Arad', 'Bucharest', graph)
+    assert problem.h(Node('Arad')) == math.inf
+    table.attach(graph)
+    problem = GraphProblem('Arad', 'Bucharest', graph)
+    assert problem.h(Node('Arad')) == 418
+    stats = SearchStats()
+    assert astar_search(problem, stats=stats).solution() == ['Sibiu', 'Rimnicu', 'Pitesti', 'Bucharest']
+    assert stats.nodes_expanded == 4
+
+    # Action graphs for online search cost 1 per action
+    one_dim = Graph(dict(one_dim_state_space.graph_dict))
+    DistanceTable(one_dim).attach(one_dim, 'State_5')
+    assert one_dim.least_costs == {'State_1': 4, 'State_2': 3, 'State_3': 2, 'State_4': 1, 'State_5': 0, 'State_6': 1}
+    agent = LRTAStarAgent(OnlineSearchProblem('State_3', 'State_5', one_dim))
+    assert agent('State_3') == 'Right'
+    assert DistanceTable(vacuum_world).cost('State_1', 'State_8') == 2
+
+
+def brute_force_random_graph(nodes, min_links, width, height):
+    """RandomGraph with each nearest neighbor found by scanning every node"""
+    g = UndirectedGraph()
+    g.locations = {node: (random.randrange(width), random.randrange(height)) for node in nodes}
+    for _ in range(min_links):
+        for node in nodes:
+            if len(g.get(node)) < min_links:
+                here = g.locations[node]
+                candidates = [n for n in nodes if n is not node and not g.get(node, n)]
+                if candidates:
+                    neighbor = min(candidates, key=lambda n: distance(g.locations[n], here))
+                    g.connect(node, neighbor, int(distance(g.locations[neighbor], here) * random.uniform(1.1, 1.5)))
+    return g
+
+
+def test_random_graph():
+    # The grid finds the same neighbors as a scan of every node, ties and
+    # cities on the same spot included
+    for seed, n, min_links, size in ((1, 300, 2, 1000), (2, 300, 3, 60), (3, 100, 4, 8), (4, 5, 5, 100)):
+        random.seed(seed)
+        expected = brute_force_random_graph(list(range(n)), min_links, size, size)
+        random.seed(seed)
+        assert RandomGraph(list(range(n)), min_links, size, size).graph_dict == expected.graph_dict
+
+    random.seed(42)
+    g = RandomGraph(list(range(200)), min_links=3, width=1000, height=1000)
+    random.seed(42)
+    assert RandomGraph(list(range(200)), min_links=3, width=1000, height=1000).graph_dict == g.graph_dict
+    assert all(len(g.get(node)) >= 3 for node in g.nodes())
+    # Every first road leads to the nearest city
+    here = g.locations[0]
+    nearest = min(range(1, 200), key=lambda n: (distance(g.locations[n], here), n))
+    assert nearest in g.get(0)
+
+    g = RandomGraph(list(range(20000)), min_links=2, width=100000, height=100000)
+    assert all(len(g.get(node)) >= 2 for node in range(20000))
+
+
+def test_benchmark(tmp_path):
+    import benchmark
+
+    puzzles = benchmark.eight_puzzles((3, 5), per_depth=2)
+    assert [name for name, _ in puzzles] == ['depth3-0', 'depth3-1', 'depth5-0', 'depth5-1']
+    assert [len(astar_search(problem).solution()) for _, problem in puzzles] == [3, 3, 5, 5]
+    assert benchmark.eight_puzzles((3, 5), per_depth=2)[2][1].initial == puzzles[2][1].initial
+
+    cases = {'8-puzzle': puzzles, 'n-queens': benchmark.queens((4,)),
+             'random-graph': benchmark.random_graphs((30,), per_size=1)}
+    searchers = {name: benchmark.SEARCHERS[name]
+                 for name in ('breadth_first_graph_search', 'bidirectional_search', 'astar_search')}
+    rows = benchmark.run_benchmarks(cases, searchers, Budget(max_expansions=5000))
+    assert len(rows) == 6 * 3
+    queens = [row for row in rows if row['corpus'] == 'n-queens']
+    assert [row['reason'] for row in queens] == ['goal', 'unsupported', 'goal']
+    assert all(row['reason'] == 'goal' for row in rows if row['corpus'] != 'n-queens')
+    assert all(row['peak_kb'] > 0 for row in rows if row['reason'] == 'goal')
+
+    for filename in ('results.csv', 'results.json'):
+        benchmark.write_results(rows, str(tmp_path / filename))
+        saved = benchmark.read_results(str(tmp_path / filename))
+        assert benchmark.compare(saved, rows, time_tolerance=math.inf) == []
+    slower = [dict(row) for row in rows]
+    slower[0]['expanded'] += 1
+    slower[1]['reason'], slower[1]['cost'] = 'expansions', None
+    assert [regression[3] for regression in benchmark.compare(rows, slower, time_tolerance=math.inf)] == \
+        ['expanded', 'reason']
@@ -5,14 +5,13 @@ import collections
 import collections.abc
 import functools
 import heapq
+import math
 import operator
 import os.path
 import random
 from itertools import chain, combinations
 from statistics import mean
 
-import numpy as np
-
 
 # ______________________________________________________________________________
 # Functions on Sequences and Iterables
@@ -150,12 +149,14 @@ def dot_product(x, y):
 
 def element_wise_product(x, y):
     """Return vector as an element-wise product of vectors x and y."""
+    import numpy as np
     assert len(x) == len(y)
     return np.multiply(x, y)
 
 
 def matrix_multiplication(x, *y):
     """Return a matrix as a matrix-multiplication of x and arbitrary number of matrices *y."""
+    import numpy as np
 
     result = x
     for _y in y:
@@ -171,6 +172,7 @@ def vector_add(a, b):
 
 def scalar_vector_product(x, y):
     """Return vector as a product of a scalar and a vector"""
+    import numpy as np
     return np.multiply(x, y)
 
 
@@ -229,6 +231,7 @@ def num_or_str(x):  # TODO: rename as `atom`
 
 
 def euclidean_distance(x, y):
+    import numpy as np
     return np.sqrt(sum((_x - _y) ** 2 for _x, _y in zip(x, y)))
 
 
@@ -241,6 +244,7 @@ def hamming_distance(x, y):
 
 
 def cross_entropy_loss(x, y):
+    import numpy as np
     return (-1.0 / len(x)) * sum(_x * np.log(_y) + (1 - _x) * np.log(1 - _y) for _x, _y in zip(x, y))
 
 
@@ -249,6 +253,7 @@ def mean_squared_error_loss(x, y):
 
 
 def rms_error(x, y):
+    import numpy as np
     return np.sqrt(ms_error(x, y))
 
 
@@ -282,6 +287,7 @@ def random_weights(min_value, max_value, num_weights):
 
 def sigmoid(x):
     """Return activation value of x with sigmoid function."""
+    import numpy as np
     return 1 / (1 + np.exp(-x))
 
 
@@ -290,14 +296,17 @@ def sigmoid_derivative(value):
 
 
 def elu(x, alpha=0.01):
+    import numpy as np
     return x if x > 0 else alpha * (np.exp(x) - 1)
 
 
 def elu_derivative(value, alpha=0.01):
+    import numpy as np
     return 1 if value > 0 else alpha * np.exp(value)
 
 
 def tanh(x):
+    import numpy as np
     return np.tanh(x)
 
 
@@ -328,16 +337,19 @@ def step(x):
 
 def gaussian(mean, st_dev, x):
     """Given the mean and standard deviation of a distribution, it returns the probability of x."""
+    import numpy as np
     return 1 / (np.sqrt(2 * np.pi) * st_dev) * np.e ** (-0.5 * (float(x - mean) / st_dev) ** 2)
 
 
 def linear_kernel(x, y=None):
+    import numpy as np
     if y is None:
         y = x
     return np.dot(x, y.T)
 
 
 def polynomial_kernel(x, y=None, degree=2.0):
+    import numpy as np
     if y is None:
         y = x
     return (1.0 + np.dot(x, y.T)) ** degree
@@ -345,6 +357,7 @@ def polynomial_kernel(x, y=None, degree=2.0):
 
 def rbf_kernel(x, y=None, gamma=None):
     """Radial-basis function kernel (aka squared-exponential kernel)."""
+    import numpy as np
     if y is None:
         y = x
     if gamma is None:
@@ -377,7 +390,7 @@ def distance(a, b):
     """The distance between two (x, y) points."""
     xA, yA = a
     xB, yB = b
-    return np.hypot((xA - xB), (yA - yB))
+    return math.hypot((xA - xB), (yA - yB))
 
 
 def distance_squared(a, b):
@@ -714,9 +727,9 @@ class hashabledict(dict):
 
 
 # ______________________________________________________________________________
-# Queues: Stack, FIFOQueue, PriorityQueue
+# Queues: Stack, FIFOQueue, PriorityQueue, IndexedPriorityQueue
 # Stack and FIFOQueue are implemented as list and collection.deque
-# PriorityQueue is implemented here
+# PriorityQueue and IndexedPriorityQueue are implemented here
 
 
 class PriorityQueue:
@@ -777,6 +790,85 @@ class PriorityQueue:
         heapq.heapify(self.heap)
 
 
+class IndexedPriorityQueue:
+    """A PriorityQueue that also keeps a map from each item to its heap entry,
+    so that membership, lookup and deletion by key take O(1) instead of a scan
+    of the whole heap. Deleted entries are only marked as removed and are
+    discarded lazily when they reach the top of the heap, which makes
+    replacing an item with a better one (decrease-key) O(log n).
+    Items are keyed by their own hash and equality, so a Node is found by its
+    state. Items with equal priority are popped in insertion order."""
+
+    def __init__(self, order='min', f=lambda x: x):
+        self.heap = []
+        self.entries = {}
+        self.counter = 0
+        if order == 'min':
+            self.f = f
+        elif order == 'max':  # now item with max f(x)
+            self.f = lambda x: -f(x)  # will be popped first
+        else:
+            raise ValueError("Order must be either 'min' or 'max'.")
+
+    def append(self, item):
+        """Insert item at its correct position, replacing any entry with the same key."""
+        if item in self.entries:
+            del self[item]
+        entry = [self.f(item), self.counter, item, True]
+        self.counter += 1
+        self.entries[item] = entry
+        heapq.heappush(self.heap, entry)
+
+    def extend(self, items):
+        """Insert each item in items at its correct position."""
+        for item in items:
+            self.append(item)
+
+    def pop(self):
+        """Pop and return the item (with min or max f(x) value)
+        depending on the order."""
+        while self.heap:
+            _, _, item, valid = heapq.heappop(self.heap)
+            if valid:
+                del self.entries[item]
+                return item
+        raise Exception('Trying to pop from empty IndexedPriorityQueue.')
+
+    def peek(self):
+        """Return the item that pop would return, without removing it."""
+        heap = self.heap
+        while heap and not heap[0][-1]:
+            heapq.heappop(heap)
+        if not heap:
+            raise Exception('Trying to peek into empty IndexedPriorityQueue.')
+        return heap[0][2]
+
+    def __len__(self):
+        """Return the number of items in the IndexedPriorityQueue."""
+        return len(self.entries)
+
+    def __contains__(self, key):
+        """Return True if the key is in IndexedPriorityQueue."""
+        return key in self.entries
+
+    def __getitem__(self, key):
+        """Returns the value associated with key in IndexedPriorityQueue.
+        Raises KeyError if key is not present."""
+        try:
+            return self.entries[key][0]
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
+
+    def __delitem__(self, key):
+        """Delete the entry for key."""
+        try:
+            entry = self.entries.pop(key)
+        except KeyError:
+            raise KeyError(str(key) + " is not in the priority queue")
+        entry[-1] = False
+        entry[2] = None
+
+
 # ______________________________________________________________________________
 # Useful Shorthands
 